@@ -0,0 +1 @@
+"""Benchmarks of the Home Connect integration."""
@@ -0,0 +1,372 @@
+"""Local fake of the Home Connect API for benchmarks.
+
+Serves the OAuth token, appliance, status, settings, program and
+command endpoints and the (per-appliance and account-wide) event
+streams for a configurable number of simulated appliances, which emit
+events at a configurable rate.
+
+    python -m benchmark.fake_server --appliances Dishwasher=10 Washer=5 \\
+        --event-rate 0.5 --port 8099
+"""
+
+import argparse
+import asyncio
+from itertools import count
+import json
+import logging
+import random
+import time
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/vnd.bsh.sdk.v1+json"
+KEEP_ALIVE_INTERVAL = 55
+
+OPERATION_STATES = [
+    "BSH.Common.EnumType.OperationState.Ready",
+    "BSH.Common.EnumType.OperationState.Run",
+    "BSH.Common.EnumType.OperationState.Finished",
+]
+DOOR_STATES = [
+    "BSH.Common.EnumType.DoorState.Closed",
+    "BSH.Common.EnumType.DoorState.Open",
+]
+
+COMMON_STATUS = {
+    "BSH.Common.Status.DoorState": DOOR_STATES[0],
+    "BSH.Common.Status.OperationState": OPERATION_STATES[0],
+    "BSH.Common.Status.RemoteControlActive": True,
+    "BSH.Common.Status.RemoteControlStartAllowed": True,
+}
+COMMON_SETTINGS = {"BSH.Common.Setting.PowerState": "BSH.Common.EnumType.PowerState.On"}
+LIGHT_SETTINGS = {
+    "Cooking.Common.Setting.Lighting": False,
+    "Cooking.Common.Setting.LightingBrightness": 50,
+    "BSH.Common.Setting.AmbientLightEnabled": False,
+    "BSH.Common.Setting.AmbientLightBrightness": 50,
+    "BSH.Common.Setting.AmbientLightColor": "BSH.Common.EnumType.AmbientLightColor.Color1",
+    "BSH.Common.Setting.AmbientLightCustomColor": "#4a88f8",
+}
+
+APPLIANCE_TYPES = {
+    "Dryer": ["LaundryCare.Dryer.Program.Cotton", "LaundryCare.Dryer.Program.Mix"],
+    "Washer": [
+        "LaundryCare.Washer.Program.Cotton",
+        "LaundryCare.Washer.Program.EasyCare",
+    ],
+    "WasherDryer": [
+        "LaundryCare.Washer.Program.Cotton",
+        "LaundryCare.Dryer.Program.Cotton",
+    ],
+    "Dishwasher": [
+        "Dishcare.Dishwasher.Program.Auto2",
+        "Dishcare.Dishwasher.Program.Eco50",
+    ],
+    "FridgeFreezer": [],
+    "Oven": [
+        "Cooking.Oven.Program.HeatingMode.HotAir",
+        "Cooking.Oven.Program.HeatingMode.PreHeating",
+    ],
+    "CoffeeMaker": [
+        "ConsumerProducts.CoffeeMaker.Program.Beverage.Espresso",
+        "ConsumerProducts.CoffeeMaker.Program.Beverage.Coffee",
+    ],
+    "Hood": ["Cooking.Common.Program.Hood.Automatic"],
+    "Hob": ["Cooking.Hob.Program.PowerLevelMode"],
+}
+
+
+class FakeAppliance:
+    """Simulated appliance."""
+
+    def __init__(self, ha_id, appliance_type):
+        """Initialize the appliance."""
+        self.ha_id = ha_id
+        self.type = appliance_type
+        self.programs = APPLIANCE_TYPES[appliance_type]
+        self.status = dict(COMMON_STATUS)
+        self.settings = dict(COMMON_SETTINGS)
+        if appliance_type in ("Hood", "Dishwasher"):
+            self.settings.update(LIGHT_SETTINGS)
+        self.active_program = None
+        self._progress = 0
+
+    def as_dict(self):
+        """Return the appliance as listed by /api/homeappliances."""
+        return {
+            "haId": self.ha_id,
+            "type": self.type,
+            "name": f"{self.type} {self.ha_id[-4:]}",
+            "brand": "Fake",
+            "vib": f"FAKE{self.type.upper()}",
+            "enumber": f"FAKE{self.type.upper()}/01",
+            "connected": True,
+        }
+
+    def next_event(self):
+        """Return the type and items of the next simulated event."""
+        now = int(time.time())
+        choice = random.random()
+        if choice < 0.7:
+            self._progress = (self._progress + 1) % 101
+            event_type, items = "NOTIFY", [
+                {
+                    "key": "BSH.Common.Option.ProgramProgress",
+                    "value": self._progress,
+                    "unit": "%",
+                },
+                {
+                    "key": "BSH.Common.Option.RemainingProgramTime",
+                    "value": (100 - self._progress) * 60,
+                    "unit": "seconds",
+                },
+            ]
+        elif choice < 0.85:
+            event_type, items = "STATUS", [
+                {
+                    "key": "BSH.Common.Status.OperationState",
+                    "value": random.choice(OPERATION_STATES),
+                }
+            ]
+        else:
+            event_type, items = "STATUS", [
+                {
+                    "key": "BSH.Common.Status.DoorState",
+                    "value": random.choice(DOOR_STATES),
+                }
+            ]
+        for item in items:
+            item.update(
+                {
+                    "timestamp": now,
+                    "level": "hint",
+                    "handling": "none",
+                    "uri": f"/api/homeappliances/{self.ha_id}/status/{item['key']}",
+                }
+            )
+            if event_type == "STATUS":
+                self.status[item["key"]] = item["value"]
+        return event_type, items
+
+
+class FakeHomeConnect:
+    """Fake Home Connect API."""
+
+    def __init__(self, appliances, event_rate):
+        """Initialize the fake API.
+
+        `appliances` maps appliance types to the number of appliances,
+        `event_rate` is the number of events per second per appliance.
+        """
+        serial = count(1)
+        self.appliances = {}
+        for appliance_type, number in appliances.items():
+            for _ in range(number):
+                ha_id = f"FAKE-{appliance_type.upper()}-{next(serial):06d}"
+                self.appliances[ha_id] = FakeAppliance(ha_id, appliance_type)
+        self.event_rate = event_rate
+        self.requests = 0
+        self.events = 0
+
+    def app(self):
+        """Return the aiohttp application."""
+        app = web.Application(middlewares=[self._count_requests])
+        base = "/api/homeappliances"
+        app.router.add_post("/security/oauth/token", self.token)
+        app.router.add_get(base, self.list_appliances)
+        app.router.add_get(f"{base}/events", self.events_all)
+        app.router.add_get(f"{base}/{{ha_id}}", self.get_appliance)
+        app.router.add_get(f"{base}/{{ha_id}}/events", self.events_appliance)
+        app.router.add_get(f"{base}/{{ha_id}}/status", self.get_status)
+        app.router.add_get(f"{base}/{{ha_id}}/settings", self.get_settings)
+        app.router.add_put(f"{base}/{{ha_id}}/settings/{{key}}", self.put_setting)
+        app.router.add_get(f"{base}/{{ha_id}}/programs/active", self.get_active)
+        app.router.add_put(f"{base}/{{ha_id}}/programs/active", self.put_active)
+        app.router.add_delete(f"{base}/{{ha_id}}/programs/active", self.no_content)
+        app.router.add_put(f"{base}/{{ha_id}}/programs/selected", self.no_content)
+        app.router.add_get(f"{base}/{{ha_id}}/programs/available", self.get_available)
+        app.router.add_get(
+            f"{base}/{{ha_id}}/programs/available/{{key}}", self.get_program
+        )
+        app.router.add_put(
+            f"{base}/{{ha_id}}/programs/{{which}}/options", self.no_content
+        )
+        app.router.add_put(
+            f"{base}/{{ha_id}}/programs/{{which}}/options/{{key}}", self.no_content
+        )
+        app.router.add_put(f"{base}/{{ha_id}}/commands/{{key}}", self.no_content)
+        return app
+
+    @web.middleware
+    async def _count_requests(self, request, handler):
+        """Count the requests."""
+        self.requests += 1
+        return await handler(request)
+
+    def _appliance(self, request):
+        """Return the appliance of a request."""
+        try:
+            return self.appliances[request.match_info["ha_id"]]
+        except KeyError as err:
+            raise web.HTTPNotFound() from err
+
+    @staticmethod
+    def _data(data):
+        """Return a JSON response with `data`."""
+        return web.json_response({"data": data}, content_type=CONTENT_TYPE)
+
+    async def token(self, request):
+        """Return a new token."""
+        return web.json_response(
+            {
+                "access_token": "fake-access-token",
+                "refresh_token": "fake-refresh-token",
+                "token_type": "Bearer",
+                "expires_in": 86400,
+                "scope": "IdentifyAppliance Monitor Control Settings",
+            }
+        )
+
+    async def list_appliances(self, request):
+        """Return all appliances."""
+        return self._data(
+            {"homeappliances": [a.as_dict() for a in self.appliances.values()]}
+        )
+
+    async def get_appliance(self, request):
+        """Return an appliance."""
+        return self._data(self._appliance(request).as_dict())
+
+    async def get_status(self, request):
+        """Return the status of an appliance."""
+        status = self._appliance(request).status
+        return self._data(
+            {"status": [{"key": k, "value": v} for k, v in status.items()]}
+        )
+
+    async def get_settings(self, request):
+        """Return the settings of an appliance."""
+        settings = self._appliance(request).settings
+        return self._data(
+            {"settings": [{"key": k, "value": v} for k, v in settings.items()]}
+        )
+
+    async def put_setting(self, request):
+        """Change a setting."""
+        appliance = self._appliance(request)
+        data = (await request.json())["data"]
+        appliance.settings[data["key"]] = data["value"]
+        return web.Response(status=204)
+
+    async def get_active(self, request):
+        """Return the active program."""
+        appliance = self._appliance(request)
+        if appliance.active_program is None:
+            return web.json_response(
+                {"error": {"key": "SDK.Error.NoProgramActive"}}, status=404
+            )
+        return self._data({"key": appliance.active_program, "options": []})
+
+    async def put_active(self, request):
+        """Start a program."""
+        appliance = self._appliance(request)
+        appliance.active_program = (await request.json())["data"]["key"]
+        return web.Response(status=204)
+
+    async def get_available(self, request):
+        """Return the available programs."""
+        programs = self._appliance(request).programs
+        return self._data({"programs": [{"key": key} for key in programs]})
+
+    async def get_program(self, request):
+        """Return the options of an available program."""
+        return self._data(
+            {
+                "key": request.match_info["key"],
+                "options": [
+                    {
+                        "key": "BSH.Common.Option.StartInRelative",
+                        "type": "Int",
+                        "unit": "seconds",
+                        "constraints": {"min": 0, "max": 86340, "stepsize": 60},
+                    }
+                ],
+            }
+        )
+
+    async def no_content(self, request):
+        """Accept a change."""
+        self._appliance(request)
+        return web.Response(status=204)
+
+    async def events_all(self, request):
+        """Stream the events of all appliances."""
+        return await self._stream(request, list(self.appliances.values()))
+
+    async def events_appliance(self, request):
+        """Stream the events of one appliance."""
+        return await self._stream(request, [self._appliance(request)])
+
+    async def _stream(self, request, appliances):
+        """Stream simulated events of `appliances`."""
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        rate = self.event_rate * len(appliances)
+        last_keep_alive = time.monotonic()
+        while True:
+            await asyncio.sleep(random.expovariate(rate) if rate else 1)
+            if time.monotonic() - last_keep_alive > KEEP_ALIVE_INTERVAL:
+                await response.write(b"event: KEEP-ALIVE\ndata: \n\n")
+                last_keep_alive = time.monotonic()
+            if not rate:
+                continue
+            appliance = random.choice(appliances)
+            event_type, items = appliance.next_event()
+            data = json.dumps({"items": items, "haId": appliance.ha_id})
+            await response.write(
+                f"event: {event_type}\ndata: {data}\nid: {appliance.ha_id}\n\n".encode()
+            )
+            self.events += 1
+
+
+def parse_appliances(values):
+    """Parse TYPE=NUMBER arguments into a dictionary."""
+    appliances = {}
+    for value in values:
+        appliance_type, _, number = value.partition("=")
+        if appliance_type not in APPLIANCE_TYPES:
+            raise argparse.ArgumentTypeError(f"Unknown appliance type {appliance_type}")
+        appliances[appliance_type] = int(number or 1)
+    return appliances
+
+
+def main():
+    """Run the fake server."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--appliances",
+        nargs="+",
+        default=["Dishwasher=1"],
+        help="appliances to simulate as TYPE=NUMBER, types: "
+        + ", ".join(APPLIANCE_TYPES),
+    )
+    parser.add_argument(
+        "--event-rate",
+        type=float,
+        default=0.2,
+        help="events per second and appliance",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fake = FakeHomeConnect(parse_appliances(args.appliances), args.event_rate)
+    web.run_app(fake.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
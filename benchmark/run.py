@@ -0,0 +1,290 @@
+"""End-to-end benchmark of the integration against the fake server.
+
+Boots Home Assistant in a temporary configuration directory with the
+integration pointed at `benchmark.fake_server` and measures the startup
+time, the number of events and state writes processed per second, the
+CPU time and the peak memory for a growing number of appliances.
+
+    python -m benchmark.run --appliances 1 10 50 --duration 30
+
+With `--record FILE` the traffic of the fake server is recorded; with
+`--replay FILE` a recording (for instance from a production install
+with the `record_file` option) is replayed instead and the throughput
+of processing it is measured.
+
+    python -m benchmark.run --replay home-connect.jsonl --replay-speed 0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from pathlib import Path
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from homeassistant import bootstrap, config as conf_util, core
+from homeassistant.const import EVENT_STATE_CHANGED
+
+DOMAIN = "home_connect_beta"
+ENTRY_ID = "benchmark"
+REPO = Path(__file__).resolve().parent.parent
+APPLIANCE_MIX = [
+    "Dishwasher",
+    "Washer",
+    "Dryer",
+    "WasherDryer",
+    "Oven",
+    "CoffeeMaker",
+    "Hood",
+    "Hob",
+    "FridgeFreezer",
+]
+
+
+def _free_port():
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _appliance_args(number):
+    """Spread `number` appliances over the appliance types."""
+    counts = {}
+    for index in range(number):
+        appliance_type = APPLIANCE_MIX[index % len(APPLIANCE_MIX)]
+        counts[appliance_type] = counts.get(appliance_type, 0) + 1
+    return [f"{key}={value}" for key, value in counts.items()]
+
+
+def _write_config(config_dir, api_url, options):
+    """Write the configuration and the config entry of the integration."""
+    (config_dir / "custom_components").mkdir()
+    os.symlink(
+        REPO / "custom_components" / DOMAIN,
+        config_dir / "custom_components" / DOMAIN,
+    )
+    (config_dir / "configuration.yaml").write_text(
+        f"""
+{DOMAIN}:
+  client_id: benchmark
+  client_secret: benchmark
+  api_url: {api_url}
+"""
+        + "".join(f"  {key}: {value}\n" for key, value in options.items())
+    )
+    (config_dir / ".storage").mkdir()
+    (config_dir / ".storage" / "core.config_entries").write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "key": "core.config_entries",
+                "data": {
+                    "entries": [
+                        {
+                            "entry_id": ENTRY_ID,
+                            "version": 1,
+                            "domain": DOMAIN,
+                            "title": "Home Connect",
+                            "data": {
+                                "auth_implementation": DOMAIN,
+                                "token": {
+                                    "access_token": "fake-access-token",
+                                    "refresh_token": "fake-refresh-token",
+                                    "token_type": "Bearer",
+                                    "expires_in": 86400,
+                                    "expires_at": time.time() + 86400,
+                                },
+                            },
+                            "options": {},
+                            "system_options": {},
+                            "source": "user",
+                            "connection_class": "cloud_push",
+                            "unique_id": None,
+                            "disabled_by": None,
+                        }
+                    ]
+                },
+            }
+        )
+    )
+
+
+async def _async_wait_initialized(hass, timeout):
+    """Wait until all appliances are initialized."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        hc_api = hass.data.get(DOMAIN, {}).get(ENTRY_ID)
+        if hc_api is not None and hc_api.devices:
+            if all(d["device"].initialized for d in hc_api.devices):
+                return hc_api
+        await asyncio.sleep(0.01)
+    raise TimeoutError("Appliances were not initialized in time")
+
+
+async def async_run(config_dir, duration, timeout):
+    """Boot Home Assistant and return the measurements.
+
+    When replaying, the events are counted by the replay until it has
+    finished instead of for `duration` seconds.
+    """
+    hass = core.HomeAssistant()
+    hass.config.config_dir = str(config_dir)
+    config = await conf_util.async_hass_config_yaml(hass)
+    state_writes = 0
+
+    def _count_state_write(event):
+        nonlocal state_writes
+        state_writes += 1
+
+    hass.bus.async_listen(EVENT_STATE_CHANGED, _count_state_write)
+
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    await bootstrap.async_from_config_dict(config, hass)
+    # started, so that stopping unloads the integration
+    await hass.async_start()
+    hc_api = await _async_wait_initialized(hass, timeout)
+    startup = time.monotonic() - start
+    startup_cpu = time.process_time() - cpu_start
+
+    events_start = sum(hc_api.metrics.events.values())
+    writes_start = state_writes
+    cpu_start = time.process_time()
+    if hc_api.replay is not None:
+        # the replay starts during initialization, so it is measured by
+        # its own count and duration
+        await hc_api.replay.finished.wait()
+        duration = hc_api.replay.duration or time.monotonic() - start
+        events = hc_api.replay.replayed
+    else:
+        await asyncio.sleep(duration)
+        events = sum(hc_api.metrics.events.values()) - events_start
+    writes = state_writes - writes_start
+    cpu = time.process_time() - cpu_start
+
+    result = {
+        "startup_s": round(startup, 3),
+        "startup_cpu_s": round(startup_cpu, 3),
+        "events_per_s": round(events / duration, 1),
+        "state_writes_per_s": round(writes / duration, 1),
+        "cpu_percent": round(100 * cpu / duration, 1),
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "requests": hc_api.metrics.as_dict(),
+    }
+    await hass.async_stop()
+    return result
+
+
+def _options(args):
+    """Return the options of the integration for the arguments."""
+    # the fake server has no rate limits, and the budget of the real API
+    # would throttle the startup of more than a few appliances
+    options = {"rate_limit_per_minute": 1000000, "rate_limit_per_day": 100000000}
+    if not args.single_event_stream:
+        options["single_event_stream"] = "false"
+    if args.record:
+        options["record_file"] = os.path.abspath(args.record)
+    if args.replay:
+        options["replay_file"] = os.path.abspath(args.replay)
+        options["replay_speed"] = args.replay_speed
+    return options
+
+
+def run_replay(args):
+    """Run the benchmark on a recording."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        config_dir = Path(config_dir)
+        _write_config(config_dir, "http://127.0.0.1", _options(args))
+        return asyncio.run(async_run(config_dir, args.duration, args.timeout))
+
+
+def run_case(number, args):
+    """Run the benchmark for `number` appliances."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmark.fake_server",
+            "--port",
+            str(port),
+            "--event-rate",
+            str(args.event_rate),
+            "--appliances",
+            *_appliance_args(number),
+        ],
+        cwd=REPO,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        with tempfile.TemporaryDirectory() as config_dir:
+            config_dir = Path(config_dir)
+            _write_config(config_dir, f"http://127.0.0.1:{port}", _options(args))
+            return asyncio.run(async_run(config_dir, args.duration, args.timeout))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appliances", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument(
+        "--event-rate",
+        type=float,
+        default=0.2,
+        help="events per second and appliance",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="seconds to measure events"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120, help="seconds to wait for startup"
+    )
+    parser.add_argument(
+        "--no-single-event-stream",
+        dest="single_event_stream",
+        action="store_false",
+        help="open one event stream per appliance",
+    )
+    parser.add_argument("--record", help="record the traffic to this file")
+    parser.add_argument("--replay", help="replay this recording instead")
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=0,
+        help="replay speed relative to the original timing, 0 for as fast as possible",
+    )
+    args = parser.parse_args()
+    if args.replay:
+        print(json.dumps({"replay": args.replay, **run_replay(args)}), flush=True)
+        return
+    results = {}
+    for number in args.appliances:
+        # ru_maxrss is a high-water mark, run one case per invocation for
+        # exact memory figures
+        results[number] = run_case(number, args)
+        print(json.dumps({"appliances": number, **results[number]}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
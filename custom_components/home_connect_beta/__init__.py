@@ -1,7 +1,8 @@
 """Support for BSH Home Connect appliances."""
 
+import asyncio
+from functools import partial
 import logging
-from datetime import timedelta
 from typing import Optional
 
 import voluptuous as vol
@@ -13,24 +14,55 @@ from homeassistant.const import (
     CONF_DEVICE,
 )
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import config_entry_oauth2_flow
 from homeassistant.helpers import config_validation as cv
-from homeassistant.util import Throttle
-from homeconnect.api import HomeConnectError
-from requests import HTTPError
+from homeassistant.helpers.storage import Store
 
 from . import api, config_flow
 from .const import (
+    API_URL,
+    ATTR_ACTION,
+    ATTR_ERROR,
+    ATTR_HA_ID,
+    ATTR_ITEMS,
     ATTR_KEY,
     ATTR_OPTIONS,
     ATTR_PROGRAM,
+    ATTR_SUCCESS,
     ATTR_UNIT,
     ATTR_VALUE,
+    BSH_ACTIVE_PROGRAM,
     BSH_PAUSE,
     BSH_RESUME,
+    BSH_SELECTED_PROGRAM,
+    CONF_API_URL,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_MIN_DELTA,
+    CONF_MIN_INTERVAL,
+    CONF_RATE_LIMIT_DAY,
+    CONF_RATE_LIMIT_MINUTE,
+    CONF_RECORD_FILE,
+    CONF_REPLAY_FILE,
+    CONF_REPLAY_SPEED,
+    CONF_SENSOR_THROTTLE,
+    CONF_SINGLE_EVENT_STREAM,
+    CONF_TOKEN_REFRESH_MARGIN,
+    DATA_CONFIG,
+    DATA_ENTITIES,
+    DEFAULT_DIAGNOSTIC_SENSORS,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_RATE_LIMIT_DAY,
+    DEFAULT_RATE_LIMIT_MINUTE,
+    DEFAULT_REPLAY_SPEED,
+    DEFAULT_SINGLE_EVENT_STREAM,
+    DEFAULT_TOKEN_REFRESH_MARGIN,
     DOMAIN,
+    EVENT_BULK_RESULT,
     OAUTH2_AUTHORIZE,
     OAUTH2_TOKEN,
+    SERVICE_BULK,
     SERVICE_OPTION_ACTIVE,
     SERVICE_OPTION_SELECTED,
     SERVICE_PAUSE,
@@ -38,18 +70,56 @@ from .const import (
     SERVICE_SELECT,
     SERVICE_SETTING,
     SERVICE_START,
+    STORAGE_KEY,
+    STORAGE_VERSION,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(minutes=1)
-
 CONFIG_SCHEMA = vol.Schema(
     {
         DOMAIN: vol.Schema(
             {
                 vol.Required(CONF_CLIENT_ID): cv.string,
                 vol.Required(CONF_CLIENT_SECRET): cv.string,
+                vol.Optional(CONF_API_URL, default=API_URL): cv.url,
+                vol.Optional(
+                    CONF_SINGLE_EVENT_STREAM, default=DEFAULT_SINGLE_EVENT_STREAM
+                ): cv.boolean,
+                vol.Optional(
+                    CONF_MAX_CONCURRENT_REQUESTS,
+                    default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                ): cv.positive_int,
+                # part of the budget is reserved for commands
+                vol.Optional(
+                    CONF_RATE_LIMIT_MINUTE, default=DEFAULT_RATE_LIMIT_MINUTE
+                ): vol.All(vol.Coerce(int), vol.Range(min=api.RESERVED_MINUTE + 1)),
+                vol.Optional(
+                    CONF_RATE_LIMIT_DAY, default=DEFAULT_RATE_LIMIT_DAY
+                ): vol.All(vol.Coerce(int), vol.Range(min=api.RESERVED_DAY + 1)),
+                vol.Optional(
+                    CONF_DIAGNOSTIC_SENSORS, default=DEFAULT_DIAGNOSTIC_SENSORS
+                ): cv.boolean,
+                vol.Optional(CONF_RECORD_FILE): cv.string,
+                vol.Optional(CONF_REPLAY_FILE): cv.string,
+                vol.Optional(CONF_REPLAY_SPEED, default=DEFAULT_REPLAY_SPEED): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Optional(
+                    CONF_TOKEN_REFRESH_MARGIN, default=DEFAULT_TOKEN_REFRESH_MARGIN
+                ): cv.positive_int,
+                vol.Optional(CONF_SENSOR_THROTTLE, default={}): {
+                    cv.string: vol.Schema(
+                        {
+                            vol.Optional(CONF_MIN_INTERVAL, default=0): vol.All(
+                                vol.Coerce(float), vol.Range(min=0)
+                            ),
+                            vol.Optional(CONF_MIN_DELTA, default=0): vol.All(
+                                vol.Coerce(float), vol.Range(min=0)
+                            ),
+                        }
+                    )
+                },
             }
         )
     },
@@ -57,56 +127,204 @@ CONFIG_SCHEMA = vol.Schema(
 )
 
 
-SERVICE_SETTING_SCHEMA = vol.Schema(
+SETTING_SCHEMA = vol.Schema(
     {
-        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
         vol.Required(ATTR_KEY): str,
         vol.Required(ATTR_VALUE): vol.Coerce(str),
         vol.Optional(ATTR_UNIT): str,
     }
 )
 
-SERVICE_PROGRAM_SCHEMA = vol.Schema(
+OPTIONS_SCHEMA = [
+    {
+        vol.Required(ATTR_KEY): str,
+        vol.Required(ATTR_VALUE): vol.Any(int, str),
+        vol.Optional(ATTR_UNIT): str,
+    }
+]
+
+OPTION_SCHEMA = vol.Schema(
+    {
+        vol.Inclusive(ATTR_KEY, "option"): str,
+        vol.Inclusive(ATTR_VALUE, "option"): vol.Coerce(str),
+        vol.Optional(ATTR_UNIT): str,
+        vol.Optional(ATTR_OPTIONS): OPTIONS_SCHEMA,
+    }
+)
+
+PROGRAM_SCHEMA = vol.Schema(
     {
-        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
         vol.Required(ATTR_PROGRAM): str,
-        vol.Optional(ATTR_OPTIONS): [
-            {
-                vol.Required(ATTR_KEY): str,
-                vol.Required(ATTR_VALUE): vol.Any(int, str),
-                vol.Optional(ATTR_UNIT): str,
-            }
-        ],
+        vol.Optional(ATTR_OPTIONS): OPTIONS_SCHEMA,
     }
 )
 
-SERVICE_COMMAND_SCHEMA = vol.Schema({vol.Required(ATTR_ENTITY_ID): cv.entity_id})
+COMMAND_SCHEMA = vol.Schema({})
+
+ACTION_SCHEMAS = {
+    SERVICE_OPTION_ACTIVE: OPTION_SCHEMA,
+    SERVICE_OPTION_SELECTED: OPTION_SCHEMA,
+    SERVICE_PAUSE: COMMAND_SCHEMA,
+    SERVICE_RESUME: COMMAND_SCHEMA,
+    SERVICE_SELECT: PROGRAM_SCHEMA,
+    SERVICE_SETTING: SETTING_SCHEMA,
+    SERVICE_START: PROGRAM_SCHEMA,
+}
+
+# validators of the whole data, applied after the (extended) schemas
+ACTION_VALIDATORS = {
+    SERVICE_OPTION_ACTIVE: [cv.has_at_least_one_key(ATTR_KEY, ATTR_OPTIONS)],
+    SERVICE_OPTION_SELECTED: [cv.has_at_least_one_key(ATTR_KEY, ATTR_OPTIONS)],
+}
+
+SERVICE_BULK_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ITEMS): [
+            vol.All(
+                vol.Schema(
+                    {
+                        vol.Exclusive(ATTR_ENTITY_ID, "target"): cv.entity_id,
+                        vol.Exclusive(ATTR_HA_ID, "target"): str,
+                        vol.Required(ATTR_ACTION): vol.In(ACTION_SCHEMAS),
+                    },
+                    extra=vol.ALLOW_EXTRA,
+                ),
+                cv.has_at_least_one_key(ATTR_ENTITY_ID, ATTR_HA_ID),
+            )
+        ]
+    }
+)
 
 
 PLATFORMS = ["binary_sensor", "light", "sensor", "switch"]
 
 
-def _get_appliance_by_entity_id(
+def _action_schema(action: str, extension: Optional[dict] = None) -> vol.All:
+    """Return the schema of the data of an action, extended by `extension`."""
+    schema = ACTION_SCHEMAS[action]
+    if extension is not None:
+        schema = schema.extend(extension)
+    return vol.All(schema, *ACTION_VALIDATORS.get(action, []))
+
+
+def _get_device_by_entity_id(
     hass: HomeAssistant, entity_id: str
 ) -> Optional[api.HomeConnectDevice]:
-    """Return a Home Connect appliance instance given an entity_id."""
-    for hc in hass.data[DOMAIN].values():
-        for dev_dict in hc.devices:
-            device = dev_dict[CONF_DEVICE]
-            for entity in device.entities:
-                if entity.entity_id == entity_id:
-                    return device.appliance
-    _LOGGER.error("Appliance for %s not found.", entity_id)
+    """Return a Home Connect device instance given an entity_id."""
+    device = hass.data[DATA_ENTITIES].get(entity_id)
+    if device is None:
+        _LOGGER.error("Appliance for %s not found.", entity_id)
+    return device
+
+
+def _get_device_by_ha_id(
+    hass: HomeAssistant, ha_id: str
+) -> Optional[api.HomeConnectDevice]:
+    """Return a Home Connect device instance given a haId."""
+    for hc_api in hass.data[DOMAIN].values():
+        for device_dict in hc_api.devices:
+            if device_dict[CONF_DEVICE].appliance.haId == ha_id:
+                return device_dict[CONF_DEVICE]
+    _LOGGER.error("Appliance %s not found.", ha_id)
     return None
 
 
+async def _async_program(device, data, method):
+    """Start or select a program with its options."""
+    program = data[ATTR_PROGRAM]
+    options = data.get(ATTR_OPTIONS)
+    if options:
+        options = await device.appliance.async_validate_options(program, options)
+    await getattr(device.appliance, method)(program, options)
+
+
+async def _async_option(device, data, method, program_key):
+    """Set options of the program stored under `program_key` in the status.
+
+    The option of `key` and `value` and the `options` are sent in one
+    request. They are checked against the constraints of the program,
+    if that is known.
+    """
+    options = list(data.get(ATTR_OPTIONS, []))
+    if ATTR_KEY in data:
+        option = {ATTR_KEY: data[ATTR_KEY], ATTR_VALUE: data[ATTR_VALUE]}
+        if ATTR_UNIT in data:
+            option[ATTR_UNIT] = data[ATTR_UNIT]
+        options.append(option)
+    program = device.status.get(program_key, {}).get(ATTR_VALUE)
+    if program is not None:
+        options = await device.appliance.async_validate_options(program, options)
+    await getattr(device.appliance, method)(options)
+
+
+async def _async_setting(device, data):
+    """Change a setting."""
+    await device.appliance.async_set_setting(
+        data[ATTR_KEY], data[ATTR_VALUE], data.get(ATTR_UNIT)
+    )
+
+
+async def _async_command(device, data, command):
+    """Execute a command."""
+    await device.appliance.async_execute_command(command)
+
+
+ACTIONS = {
+    SERVICE_OPTION_ACTIVE: partial(
+        _async_option,
+        method="async_set_active_program_options",
+        program_key=BSH_ACTIVE_PROGRAM,
+    ),
+    SERVICE_OPTION_SELECTED: partial(
+        _async_option,
+        method="async_set_selected_program_options",
+        program_key=BSH_SELECTED_PROGRAM,
+    ),
+    SERVICE_PAUSE: partial(_async_command, command=BSH_PAUSE),
+    SERVICE_RESUME: partial(_async_command, command=BSH_RESUME),
+    SERVICE_SELECT: partial(_async_program, method="async_select_program"),
+    SERVICE_SETTING: _async_setting,
+    SERVICE_START: partial(_async_program, method="async_start_program"),
+}
+
+
+async def _async_bulk_item(hass: HomeAssistant, item: dict) -> dict:
+    """Run the action of an item of a bulk call and return its result."""
+    action = item[ATTR_ACTION]
+    result = {
+        key: item[key]
+        for key in (ATTR_ENTITY_ID, ATTR_HA_ID, ATTR_ACTION)
+        if key in item
+    }
+    if ATTR_ENTITY_ID in item:
+        device = _get_device_by_entity_id(hass, item[ATTR_ENTITY_ID])
+    else:
+        device = _get_device_by_ha_id(hass, item[ATTR_HA_ID])
+    if device is None:
+        return {**result, ATTR_SUCCESS: False, ATTR_ERROR: "Appliance not found"}
+    payload = {
+        key: value
+        for key, value in item.items()
+        if key not in (ATTR_ENTITY_ID, ATTR_HA_ID, ATTR_ACTION)
+    }
+    try:
+        await ACTIONS[action](device, _action_schema(action)(payload))
+    except (vol.Invalid, ValueError, api.HomeConnectError) as err:
+        _LOGGER.error("%s of %s failed: %s", action, device.appliance.name, err)
+        return {**result, ATTR_SUCCESS: False, ATTR_ERROR: str(err)}
+    return {**result, ATTR_SUCCESS: True}
+
+
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up Home Connect component."""
     hass.data[DOMAIN] = {}
+    hass.data[DATA_ENTITIES] = {}
 
     if DOMAIN not in config:
         return True
 
+    hass.data[DATA_CONFIG] = config[DOMAIN]
+
     config_flow.OAuth2FlowHandler.async_register_implementation(
         hass,
         config_entry_oauth2_flow.LocalOAuth2Implementation(
@@ -114,95 +332,43 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
             DOMAIN,
             config[DOMAIN][CONF_CLIENT_ID],
             config[DOMAIN][CONF_CLIENT_SECRET],
-            OAUTH2_AUTHORIZE,
-            OAUTH2_TOKEN,
+            f"{config[DOMAIN][CONF_API_URL]}{OAUTH2_AUTHORIZE}",
+            f"{config[DOMAIN][CONF_API_URL]}{OAUTH2_TOKEN}",
         ),
     )
 
-    async def _async_service_program(call, method):
-        """Generic callback for services taking a program."""
-        program = call.data[ATTR_PROGRAM]
-        entity_id = call.data[ATTR_ENTITY_ID]
-        options = call.data.get(ATTR_OPTIONS)
-        appliance = _get_appliance_by_entity_id(hass, entity_id)
-        if appliance is not None:
-            await hass.async_add_executor_job(
-                getattr(appliance, method), program, options
-            )
-
-    async def _async_service_command(call, command):
-        """Generic callback for services executing a command."""
-        entity_id = call.data[ATTR_ENTITY_ID]
-        appliance = _get_appliance_by_entity_id(hass, entity_id)
-        if appliance is not None:
-            await hass.async_add_executor_job(appliance.execute_command, command)
-
-    async def _async_service_key_value(call, method):
-        """Generic callback for services taking a key and value."""
-        key = call.data[ATTR_KEY]
-        value = call.data[ATTR_VALUE]
-        unit = call.data.get(ATTR_UNIT)
+    async def async_service(call):
+        """Service running an action on the appliance of an entity."""
         entity_id = call.data[ATTR_ENTITY_ID]
-        appliance = _get_appliance_by_entity_id(hass, entity_id)
-        if appliance is not None:
-            await hass.async_add_executor_job(
-                getattr(appliance, method), key, value, unit,
-            )
-
-    async def async_service_option_active(call):
-        """Service for setting an option for an active program."""
-        await _async_service_key_value(call, "set_options_active_program")
-
-    async def async_service_option_selected(call):
-        """Service for setting an option for a selected program."""
-        await _async_service_key_value(call, "set_options_selected_program")
-
-    async def async_service_pause(call):
-        """Service for pausing a program."""
-        await _async_service_command(call, BSH_PAUSE)
-
-    async def async_service_resume(call):
-        """Service for resuming a paused program."""
-        await _async_service_command(call, BSH_RESUME)
-
-    async def async_service_select(call):
-        """Service for selecting a program."""
-        await _async_service_program(call, "select_program")
-
-    async def async_service_setting(call):
-        """Service for changing a setting."""
-        await _async_service_key_value(call, "set_setting")
-
-    async def async_service_start(call):
-        """Service for starting a program."""
-        await _async_service_program(call, "start_program")
+        device = _get_device_by_entity_id(hass, entity_id)
+        if device is None:
+            return
+        try:
+            await ACTIONS[call.service](device, call.data)
+        except ValueError as err:
+            _LOGGER.error("Invalid %s for %s: %s", call.service, entity_id, err)
+
+    async def async_service_bulk(call):
+        """Service running actions on several appliances concurrently.
+
+        The results are fired as an event with one result per item.
+        """
+        results = await asyncio.gather(
+            *(_async_bulk_item(hass, item) for item in call.data[ATTR_ITEMS])
+        )
+        hass.bus.async_fire(EVENT_BULK_RESULT, {ATTR_ITEMS: results})
 
+    for service in ACTION_SCHEMAS:
+        hass.services.async_register(
+            DOMAIN,
+            service,
+            async_service,
+            schema=_action_schema(
+                service, {vol.Required(ATTR_ENTITY_ID): cv.entity_id}
+            ),
+        )
     hass.services.async_register(
-        DOMAIN,
-        SERVICE_OPTION_ACTIVE,
-        async_service_option_active,
-        schema=SERVICE_SETTING_SCHEMA,
-    )
-    hass.services.async_register(
-        DOMAIN,
-        SERVICE_OPTION_SELECTED,
-        async_service_option_selected,
-        schema=SERVICE_SETTING_SCHEMA,
-    )
-    hass.services.async_register(
-        DOMAIN, SERVICE_SETTING, async_service_setting, schema=SERVICE_SETTING_SCHEMA
-    )
-    hass.services.async_register(
-        DOMAIN, SERVICE_PAUSE, async_service_pause, schema=SERVICE_COMMAND_SCHEMA
-    )
-    hass.services.async_register(
-        DOMAIN, SERVICE_RESUME, async_service_resume, schema=SERVICE_COMMAND_SCHEMA
-    )
-    hass.services.async_register(
-        DOMAIN, SERVICE_SELECT, async_service_select, schema=SERVICE_PROGRAM_SCHEMA
-    )
-    hass.services.async_register(
-        DOMAIN, SERVICE_START, async_service_start, schema=SERVICE_PROGRAM_SCHEMA
+        DOMAIN, SERVICE_BULK, async_service_bulk, schema=SERVICE_BULK_SCHEMA
     )
 
     return True
@@ -214,14 +380,54 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hass, entry
     )
 
-    hc_api = api.ConfigEntryAuth(hass, entry, implementation)
+    config = hass.data.get(DATA_CONFIG, {})
+    hc_api = api.ConfigEntryAuth(
+        hass,
+        entry,
+        implementation,
+        api_url=config.get(CONF_API_URL, API_URL),
+        single_event_stream=config.get(
+            CONF_SINGLE_EVENT_STREAM, DEFAULT_SINGLE_EVENT_STREAM
+        ),
+        max_concurrent_requests=config.get(
+            CONF_MAX_CONCURRENT_REQUESTS, DEFAULT_MAX_CONCURRENT_REQUESTS
+        ),
+        rate_limit_per_minute=config.get(
+            CONF_RATE_LIMIT_MINUTE, DEFAULT_RATE_LIMIT_MINUTE
+        ),
+        rate_limit_per_day=config.get(CONF_RATE_LIMIT_DAY, DEFAULT_RATE_LIMIT_DAY),
+        record_file=(
+            hass.config.path(config[CONF_RECORD_FILE])
+            if CONF_RECORD_FILE in config
+            else None
+        ),
+        replay_file=(
+            hass.config.path(config[CONF_REPLAY_FILE])
+            if CONF_REPLAY_FILE in config
+            else None
+        ),
+        replay_speed=config.get(CONF_REPLAY_SPEED, DEFAULT_REPLAY_SPEED),
+        token_refresh_margin=config.get(
+            CONF_TOKEN_REFRESH_MARGIN, DEFAULT_TOKEN_REFRESH_MARGIN
+        ),
+    )
+
+    if not await hc_api.async_load_devices():
+        try:
+            await hc_api.async_get_devices()
+        except (api.HomeConnectError, ValueError) as err:
+            raise ConfigEntryNotReady(f"Cannot fetch appliances: {err}") from err
 
     hass.data[DOMAIN][entry.entry_id] = hc_api
-
-    await update_all_devices(hass, entry)
+    # only once set up, so that the timer is cancelled on unload
+    hc_api.async_schedule_token_refresh()
 
     hass.config_entries.async_setup_platforms(entry, PLATFORMS)
 
+    # devices not restored from the snapshot become available one by one
+    # as they are initialized
+    hc_api.async_initialize_devices()
+
     return True
 
 
@@ -229,19 +435,14 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        hc_api = hass.data[DOMAIN].pop(entry.entry_id)
+        await hc_api.async_stop()
 
     return unload_ok
 
 
-@Throttle(SCAN_INTERVAL)
-async def update_all_devices(hass, entry):
-    """Update all the devices."""
-    data = hass.data[DOMAIN]
-    hc_api = data[entry.entry_id]
-    try:
-        await hass.async_add_executor_job(hc_api.get_devices)
-        for device_dict in hc_api.devices:
-            await hass.async_add_executor_job(device_dict["device"].initialize)
-    except HTTPError as err:
-        _LOGGER.warning("Cannot update devices: %s", err.response.status_code)
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the snapshot of a removed config entry."""
+    await Store(
+        hass, STORAGE_VERSION, STORAGE_KEY.format(entry.entry_id)
+    ).async_remove()
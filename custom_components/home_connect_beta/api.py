@@ -1,10 +1,16 @@
 """API for Home Connect bound to HASS OAuth."""
 
-from asyncio import run_coroutine_threadsafe
+import asyncio
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque, namedtuple
+from functools import partial
+import json
 import logging
+import random
+import re
+import time
 
-import homeconnect
-from homeconnect.api import HomeConnectError
+from aiohttp import ClientError, ClientResponseError, ClientTimeout
 
 from homeassistant import config_entries, core
 from homeassistant.const import (
@@ -16,10 +22,14 @@ from homeassistant.const import (
     PERCENTAGE,
     TIME_SECONDS,
 )
+from homeassistant.core import callback
 from homeassistant.helpers import config_entry_oauth2_flow
-from homeassistant.helpers.dispatcher import dispatcher_send
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 
 from .const import (
+    API_URL,
     ATTR_AMBIENT,
     ATTR_DESC,
     ATTR_DEVICE,
@@ -32,13 +42,393 @@ from .const import (
     BSH_OPERATION_STATE,
     BSH_POWER_OFF,
     BSH_POWER_STANDBY,
+    DATA_ENTITIES,
+    EVENT_TYPE_CONNECTED,
+    EVENT_TYPE_DISCONNECTED,
+    EVENT_TYPE_PAIRED,
+    EVENT_TYPES_STATUS,
+    SIGNAL_PROGRAMS_CHANGED,
     SIGNAL_UPDATE_ENTITIES,
+    STORAGE_KEY,
+    STORAGE_VERSION,
 )
+from .replay import EventRecorder, ReplaySession
 
 _LOGGER = logging.getLogger(__name__)
 
+ENDPOINT_APPLIANCES = "/api/homeappliances"
+CONTENT_TYPE = "application/vnd.bsh.sdk.v1+json"
+
+REQUEST_TIMEOUT = 30
+STREAM_TIMEOUT = 120
+STREAM_RETRY_DELAY = 1
+STREAM_MAX_RETRY_DELAY = 300
+SNAPSHOT_SAVE_DELAY = 60
+CONFIRMATION_TIMEOUT = 30
+PROGRAMS_TTL = 7 * 24 * 3600
+TOKEN_REFRESH_RETRY_DELAY = 60
+# tokens expiring sooner are refreshed before the request instead of in the background
+TOKEN_EXPIRY_SKEW = 20
+
+# see https://developer.home-connect.com/docs/general/ratelimiting
+RATE_LIMIT_MINUTE = 50
+RATE_LIMIT_DAY = 1000
+RESERVED_MINUTE = 10
+RESERVED_DAY = 100
+RATE_LIMIT_MAX_WAIT = 60
+DEFAULT_RETRY_AFTER = 60
+
+# consecutive failed requests after which an appliance is considered offline
+BREAKER_THRESHOLD = 3
+BREAKER_PROBE_DELAY = 30
+BREAKER_MAX_PROBE_DELAY = 1800
+# errors of the API meaning that the appliance cannot be reached
+OFFLINE_ERRORS = (
+    "SDK.Error.HomeAppliance.Connection.Initialization.Failed",
+    "SDK.Error.504.GatewayTimeout",
+)
+ERROR_NO_PROGRAM_ACTIVE = "SDK.Error.NoProgramActive"
+
+PRIORITY_BACKGROUND = "background"
+PRIORITY_COMMAND = "command"
+
+WRITE_SETTING = "/settings"
+WRITE_ACTIVE_OPTION = "/programs/active/options"
+WRITE_SELECTED_OPTION = "/programs/selected/options"
+# program options can be written together in one request, settings cannot
+BATCH_WRITES = (WRITE_ACTIVE_OPTION, WRITE_SELECTED_OPTION)
+
+ENDPOINT_PATTERNS = (
+    (
+        re.compile(r"^/api/homeappliances/(?!events$)[^/]+"),
+        "/api/homeappliances/{haId}",
+    ),
+    (re.compile(r"/(settings|options|commands|available)/[^/]+$"), r"/\1/{key}"),
+)
+
+Event = namedtuple("Event", ["event", "data", "id"])
+PendingCommand = namedtuple("PendingCommand", ["value", "previous", "start", "cancel"])
+
+
+class HomeConnectError(Exception):
+    """Error returned by the Home Connect API."""
+
+
+class ApplianceOfflineError(HomeConnectError):
+    """Error of an appliance that cannot be reached."""
+
+
+class ApiConnectionError(HomeConnectError):
+    """Error of a request that did not reach the Home Connect API."""
+
+
+class RateLimiter:
+    """Request budget of a Home Connect account.
+
+    Keeps track of the requests of the last minute and the last day in
+    sliding windows and honours the Retry-After of rate limited (429)
+    responses. Part of both budgets, at most a fifth, is reserved for
+    user commands, so background refreshes can never use up the budget
+    of commands.
+    """
+
+    def __init__(
+        self,
+        per_minute=RATE_LIMIT_MINUTE,
+        per_day=RATE_LIMIT_DAY,
+        reserved_minute=RESERVED_MINUTE,
+        reserved_day=RESERVED_DAY,
+    ):
+        """Initialize the rate limiter."""
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.reserved_minute = min(reserved_minute, per_minute // 5)
+        self.reserved_day = min(reserved_day, per_day // 5)
+        self.rate_limited = 0
+        self._minute = deque()
+        self._day = deque()
+        self._blocked_until = 0.0
+
+    @property
+    def remaining_minute(self):
+        """Return the number of requests left in the current minute."""
+        self._purge(time.monotonic())
+        return max(self.per_minute - len(self._minute), 0)
+
+    @property
+    def remaining_day(self):
+        """Return the number of requests left in the current day."""
+        self._purge(time.monotonic())
+        return max(self.per_day - len(self._day), 0)
+
+    def _purge(self, now):
+        """Drop the requests that have left the windows."""
+        while self._minute and self._minute[0] <= now - 60:
+            self._minute.popleft()
+        while self._day and self._day[0] <= now - 86400:
+            self._day.popleft()
+
+    def _wait_time(self, now, priority):
+        """Return the time to wait before a request may be made."""
+        reserved_minute = reserved_day = 0
+        if priority != PRIORITY_COMMAND:
+            reserved_minute, reserved_day = self.reserved_minute, self.reserved_day
+        wait = self._blocked_until - now
+        if self._minute and len(self._minute) >= self.per_minute - reserved_minute:
+            wait = max(wait, self._minute[0] + 60 - now)
+        if self._day and len(self._day) >= self.per_day - reserved_day:
+            wait = max(wait, self._day[0] + 86400 - now)
+        return wait
+
+    async def async_acquire(self, priority=PRIORITY_BACKGROUND):
+        """Wait until the budget allows a request and account for it."""
+        while True:
+            now = time.monotonic()
+            self._purge(now)
+            wait = self._wait_time(now, priority)
+            if wait <= 0:
+                break
+            if wait > RATE_LIMIT_MAX_WAIT:
+                raise HomeConnectError(
+                    f"Request budget exhausted, retry in {wait:.0f} s"
+                )
+            _LOGGER.debug("Request budget exhausted, waiting %.1f s", wait)
+            await asyncio.sleep(wait)
+        self._minute.append(now)
+        self._day.append(now)
+
+    def block(self, retry_after):
+        """Block all requests for `retry_after` seconds."""
+        self.rate_limited += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+
+class Histogram:
+    """Histogram of durations in seconds."""
+
+    BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, buckets=BUCKETS):
+        """Initialize the histogram."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Add a duration to the histogram."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        """Return the histogram as a dictionary."""
+        buckets = {
+            f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)
+        }
+        buckets["le_inf"] = self.counts[-1]
+        return {"count": self.count, "sum": round(self.sum, 3), "buckets": buckets}
+
+    @property
+    def mean(self):
+        """Return the mean duration or None if there are none."""
+        if not self.count:
+            return None
+        return self.sum / self.count
+
+
+class Metrics:
+    """Performance metrics of a Home Connect account."""
+
+    def __init__(self):
+        """Initialize the metrics."""
+        self.request_latency = defaultdict(Histogram)
+        self.request_errors = Counter()
+        self.rate_limited = Counter()
+        self.event_lag = Histogram()
+        self.confirmation_latency = Histogram()
+        self.stream_reconnects = Counter()
+        self.stream_gap = Histogram()
+        self.events = Counter()
+        self.startup = {}
+        self._recent_events = defaultdict(deque)
+
+    @staticmethod
+    def endpoint(method, path):
+        """Return the endpoint of a request with haId and keys replaced."""
+        for pattern, replacement in ENDPOINT_PATTERNS:
+            path = pattern.sub(replacement, path)
+        return f"{method.upper()} {path}"
+
+    def record_request(self, endpoint, duration, status):
+        """Record the duration and outcome of a request."""
+        self.request_latency[endpoint].observe(duration)
+        if status is None or status >= 400:
+            self.request_errors[endpoint] += 1
+        if status == 429:
+            self.rate_limited[endpoint] += 1
+
+    def record_event(self, ha_id):
+        """Record the arrival of an event of the appliance `ha_id`."""
+        now = time.monotonic()
+        self.events[ha_id] += 1
+        recent = self._recent_events[ha_id]
+        recent.append(now)
+        while recent[0] <= now - 60:
+            recent.popleft()
+
+    def events_per_minute(self, ha_id):
+        """Return the number of events of the appliance `ha_id` in the last minute."""
+        recent = self._recent_events[ha_id]
+        while recent and recent[0] <= time.monotonic() - 60:
+            recent.popleft()
+        return len(recent)
+
+    def as_dict(self):
+        """Return the metrics as a dictionary."""
+        return {
+            "requests": {
+                endpoint: {
+                    "latency": histogram.as_dict(),
+                    "errors": self.request_errors[endpoint],
+                    "rate_limited": self.rate_limited[endpoint],
+                }
+                for endpoint, histogram in self.request_latency.items()
+            },
+            "event_lag": self.event_lag.as_dict(),
+            "confirmation_latency": self.confirmation_latency.as_dict(),
+            "streams": {
+                "reconnects": dict(self.stream_reconnects),
+                "gap": self.stream_gap.as_dict(),
+            },
+            "events": {
+                ha_id: {"total": total, "last_minute": self.events_per_minute(ha_id)}
+                for ha_id, total in self.events.items()
+            },
+            "startup": dict(self.startup),
+        }
+
+
+class CircuitBreaker:
+    """Memory of the failed requests to an appliance.
+
+    Opens after `threshold` consecutive requests the API answered with
+    the appliance being unreachable, so that requests to an offline
+    appliance fail fast instead of waiting for the API. Requests that do
+    not reach the API are not counted. While
+    open, the appliance is probed in the background with exponential
+    backoff; the breaker closes when a probe finds the appliance
+    connected again or a CONNECTED event arrives.
+    """
+
+    def __init__(self, hass, probe, threshold=BREAKER_THRESHOLD):
+        """Initialize the circuit breaker.
 
-class ConfigEntryAuth(homeconnect.HomeConnectAPI):
+        `probe` is a coroutine function returning true if the appliance
+        is reachable.
+        """
+        self.hass = hass
+        self.threshold = threshold
+        self.failures = 0
+        self.is_open = False
+        self.on_close = None
+        self._probe = probe
+        self._probe_delay = BREAKER_PROBE_DELAY
+        self._cancel_probe = None
+
+    @callback
+    def record_success(self):
+        """Record a request that reached the appliance."""
+        self.failures = 0
+
+    @callback
+    def record_failure(self):
+        """Record a request that did not reach the appliance."""
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.async_open()
+
+    @callback
+    def async_open(self):
+        """Fail all requests fast until the appliance is reachable again."""
+        if self.is_open:
+            return
+        self.is_open = True
+        self._probe_delay = BREAKER_PROBE_DELAY
+        self._async_schedule_probe()
+
+    @callback
+    def async_close(self):
+        """Let requests pass again and notify `on_close`."""
+        self.failures = 0
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.async_stop()
+        if self.on_close is not None:
+            self.on_close()
+
+    @callback
+    def async_stop(self):
+        """Stop probing."""
+        if self._cancel_probe is not None:
+            self._cancel_probe()
+            self._cancel_probe = None
+
+    @callback
+    def _async_schedule_probe(self):
+        """Probe the appliance after the current backoff delay."""
+        self._cancel_probe = async_call_later(
+            self.hass, self._probe_delay, self._async_probe
+        )
+
+    @callback
+    def _async_probe(self, _now):
+        """Start a probe."""
+        self._cancel_probe = None
+        self.hass.async_create_task(self._async_run_probe())
+
+    async def _async_run_probe(self):
+        """Close the breaker if the appliance is reachable, else back off."""
+        if await self._probe():
+            self.async_close()
+        elif self.is_open:
+            self._probe_delay = min(2 * self._probe_delay, BREAKER_MAX_PROBE_DELAY)
+            self._async_schedule_probe()
+
+
+def _retry_after(headers):
+    """Return the Retry-After of a response in seconds."""
+    try:
+        return int(headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+async def async_read_events(stream):
+    """Yield the events of a server-sent event stream."""
+    event_type, data, event_id = None, [], None
+    async for line in stream:
+        line = line.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if event_type is not None or data:
+                yield Event(event_type or "message", "\n".join(data), event_id)
+            event_type, data, event_id = None, [], None
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event_type = value
+        elif field == "data":
+            data.append(value)
+        elif field == "id":
+            event_id = value
+
+
+class ConfigEntryAuth:
     """Provide Home Connect authentication tied to an OAuth2 based config entry."""
 
     def __init__(
@@ -46,50 +436,527 @@ class ConfigEntryAuth(homeconnect.HomeConnectAPI):
         hass: core.HomeAssistant,
         config_entry: config_entries.ConfigEntry,
         implementation: config_entry_oauth2_flow.AbstractOAuth2Implementation,
+        api_url: str = API_URL,
+        single_event_stream: bool = True,
+        max_concurrent_requests: int = 5,
+        rate_limit_per_minute: int = RATE_LIMIT_MINUTE,
+        rate_limit_per_day: int = RATE_LIMIT_DAY,
+        record_file: str = None,
+        replay_file: str = None,
+        replay_speed: float = 1.0,
+        token_refresh_margin: int = 600,
     ):
-        """Initialize Home Connect Auth."""
+        """Initialize Home Connect Auth.
+
+        If `single_event_stream` is set, the events of all appliances are
+        received through the account-wide event stream and passed on to
+        the devices by haId, instead of opening one stream per appliance.
+        At most `max_concurrent_requests` REST requests are in flight at
+        the same time, and at most `rate_limit_per_minute` and
+        `rate_limit_per_day` requests are made in a minute and a day. All
+        requests go to `api_url`.
+
+        If `record_file` is set, all responses and events are appended to
+        it. If `replay_file` is set, the API is not contacted at all;
+        requests are answered from that recording and its events are
+        replayed at `replay_speed` (0 for as fast as possible) once the
+        devices are initialized.
+
+        The access token is refreshed in the background
+        `token_refresh_margin` seconds before it expires.
+        """
         self.hass = hass
         self.config_entry = config_entry
-        self.session = config_entry_oauth2_flow.OAuth2Session(
-            hass, config_entry, implementation
-        )
-        super().__init__(self.session.token)
+        self.recorder = EventRecorder(hass, record_file) if record_file else None
+        self.replay = None
+        if replay_file:
+            self.replay = ReplaySession(hass, replay_file, replay_speed)
+            self.session = self.replay
+        else:
+            self.session = config_entry_oauth2_flow.OAuth2Session(
+                hass, config_entry, implementation
+            )
+        self.host = api_url
         self.devices = []
+        self.single_event_stream = single_event_stream
+        self._event_callbacks = {}
+        self._tasks = []
+        self._listening = False
+        self._request_semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.rate_limiter = RateLimiter(rate_limit_per_minute, rate_limit_per_day)
+        self.metrics = Metrics()
+        self._stale_entities = {}
+        self.token_refresh_margin = token_refresh_margin
+        self._token_refresh = None
+        self._cancel_token_refresh = None
+        self._store = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY.format(config_entry.entry_id)
+        )
+        self._restored = False
 
-    def refresh_tokens(self) -> dict:
-        """Refresh and return new Home Connect tokens using Home Assistant OAuth2 session."""
-        run_coroutine_threadsafe(
-            self.session.async_ensure_token_valid(), self.hass.loop
-        ).result()
+    async def async_request(self, method, path, data=None):
+        """Make a request and return the decoded JSON response.
 
-        return self.session.token
+        Every request passes the rate limiter; changes (PUT and DELETE)
+        are user commands and take priority over background reads.
+        """
+        kwargs = {}
+        if data is not None:
+            kwargs["data"] = json.dumps(data)
+            kwargs["headers"] = {"Content-Type": CONTENT_TYPE, "Accept": CONTENT_TYPE}
+        priority = PRIORITY_BACKGROUND if method == "get" else PRIORITY_COMMAND
+        await self.rate_limiter.async_acquire(priority)
+        try:
+            await self.async_ensure_token_valid()
+        except (ClientError, asyncio.TimeoutError) as err:
+            raise ApiConnectionError(f"Cannot refresh access token: {err}") from err
+        endpoint = self.metrics.endpoint(method, path)
+        try:
+            async with self._request_semaphore:
+                start = time.monotonic()
+                resp = await self.session.async_request(
+                    method,
+                    f"{self.host}{path}",
+                    timeout=ClientTimeout(total=REQUEST_TIMEOUT),
+                    **kwargs,
+                )
+                content = await resp.read()
+        except (ClientError, asyncio.TimeoutError) as err:
+            self.metrics.record_request(endpoint, time.monotonic() - start, None)
+            raise ApiConnectionError(f"Request to {path} failed: {err}") from err
+        self.metrics.record_request(endpoint, time.monotonic() - start, resp.status)
+        if self.recorder is not None:
+            self.recorder.record_response(method, path, resp.status, content)
+        if resp.status == 429:
+            self.rate_limiter.block(_retry_after(resp.headers))
+        res = {}
+        if content:
+            try:
+                res = json.loads(content)
+            except ValueError as err:
+                raise ValueError(f"Cannot parse {content} as JSON") from err
+        if "error" in res:
+            if res["error"].get(ATTR_KEY) in OFFLINE_ERRORS:
+                raise ApplianceOfflineError(res["error"])
+            raise HomeConnectError(res["error"])
+        if resp.status >= 400:
+            raise HomeConnectError(f"Request to {path} failed: {resp.status}")
+        return res
+
+    def _token_expires_in(self):
+        """Return the seconds until the access token expires."""
+        return self.session.token["expires_at"] - time.time()
+
+    async def async_ensure_token_valid(self):
+        """Make sure the access token is valid before a request.
+
+        A token expiring within the refresh margin is refreshed in the
+        background, only an expired token is waited for.
+        """
+        if self.replay is not None:
+            return
+        expires_in = self._token_expires_in()
+        if expires_in < TOKEN_EXPIRY_SKEW:
+            await self.async_refresh_token()
+        elif expires_in < self.token_refresh_margin:
+            self._async_start_token_refresh()
+
+    @callback
+    def _async_start_token_refresh(self):
+        """Return the token refresh in flight, starting one if there is none."""
+        if self._token_refresh is None:
+            self._token_refresh = self.hass.async_create_task(
+                self._async_refresh_token()
+            )
+            self._token_refresh.add_done_callback(self._token_refresh_done)
+        return self._token_refresh
+
+    def _token_refresh_done(self, task):
+        """Forget a finished token refresh."""
+        self._token_refresh = None
+        if not task.cancelled() and task.exception() is not None:
+            _LOGGER.debug("Token refresh failed: %s", task.exception())
+
+    async def async_refresh_token(self):
+        """Refresh the access token.
 
-    def get_devices(self):
+        Concurrent calls wait for the same refresh instead of each
+        refreshing the token.
+        """
+        await asyncio.shield(self._async_start_token_refresh())
+
+    async def _async_refresh_token(self):
+        """Refresh the access token and store it in the config entry."""
+        _LOGGER.debug("Refreshing access token")
+        token = await self.session.implementation.async_refresh_token(
+            self.session.token
+        )
+        self.hass.config_entries.async_update_entry(
+            self.config_entry, data={**self.config_entry.data, "token": token}
+        )
+
+    @callback
+    def async_schedule_token_refresh(self):
+        """Refresh the access token in the background before it expires."""
+        if self.replay is not None:
+            return
+        self._cancel_token_refresh = async_call_later(
+            self.hass,
+            max(self._token_expires_in() - self.token_refresh_margin, 0),
+            self._async_background_token_refresh,
+        )
+
+    async def _async_background_token_refresh(self, _now):
+        """Refresh the access token and schedule the next refresh."""
+        self._cancel_token_refresh = None
+        try:
+            await self.async_refresh_token()
+        except (ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.warning("Unable to refresh access token: %s", err)
+            self._cancel_token_refresh = async_call_later(
+                self.hass,
+                TOKEN_REFRESH_RETRY_DELAY,
+                self._async_background_token_refresh,
+            )
+            return
+        self.async_schedule_token_refresh()
+
+    async def async_get(self, path):
+        """Get data as dictionary from an endpoint."""
+        res = await self.async_request("get", path)
+        if not res:
+            return {}
+        if "data" not in res:
+            raise HomeConnectError("Unexpected error")
+        return res["data"]
+
+    async def async_put(self, path, data):
+        """Send (PUT) data to an endpoint."""
+        return await self.async_request("put", path, data)
+
+    async def async_delete(self, path):
+        """Delete an endpoint."""
+        return await self.async_request("delete", path)
+
+    async def async_get_appliances(self):
+        """Return a list of all appliances of the account."""
+        data = await self.async_get(ENDPOINT_APPLIANCES)
+        return [
+            HomeConnectAppliance(
+                self,
+                app["haId"],
+                vib=app.get("vib"),
+                brand=app.get("brand"),
+                type=app.get("type"),
+                name=app.get("name"),
+                enumber=app.get("enumber"),
+                connected=app.get("connected", False),
+            )
+            for app in data.get("homeappliances", [])
+        ]
+
+    @callback
+    def async_listen_appliance_events(self, ha_id, event_callback):
+        """Pass the events of the appliance `ha_id` to `event_callback`."""
+        self._event_callbacks[ha_id] = event_callback
+        if self.replay is not None:
+            return
+        if not self.single_event_stream:
+            self._async_listen(
+                f"{ENDPOINT_APPLIANCES}/{ha_id}/events", event_callback, ha_id
+            )
+            return
+        if not self._listening:
+            self._listening = True
+            self._async_listen(f"{ENDPOINT_APPLIANCES}/events", self._demux_event)
+
+    @callback
+    def _demux_event(self, event):
+        """Pass an event of the account-wide stream on to its appliance."""
+        event_callback = self._event_callbacks.get(event.id)
+        if event_callback is not None:
+            event_callback(event)
+
+    @callback
+    def _async_listen(self, path, event_callback, ha_id=None):
+        """Start a task passing every event of an event stream to `event_callback`.
+
+        The stream carries the events of the appliance `ha_id`, or of all
+        appliances if it is None.
+        """
+        self._tasks.append(
+            self.hass.loop.create_task(
+                self._async_read_stream(path, event_callback, ha_id)
+            )
+        )
+
+    async def _async_read_stream(self, path, event_callback, ha_id=None):
+        """Read an event stream, reconnecting whenever it drops.
+
+        Reconnects back off exponentially with jitter. Events missed
+        while the stream was down are made up for by refreshing the
+        status of its appliances once it is connected again.
+        """
+        endpoint = self.metrics.endpoint("get", path)
+        attempt = 0
+        dropped = None
+        while True:
+            _LOGGER.debug("Listening to event stream %s", path)
+            delay = None
+            try:
+                await self.async_ensure_token_valid()
+                resp = await self.session.async_request(
+                    "get",
+                    f"{self.host}{path}",
+                    headers={
+                        "Accept": "text/event-stream",
+                        "Cache-Control": "no-cache",
+                    },
+                    timeout=ClientTimeout(total=None, sock_read=STREAM_TIMEOUT),
+                )
+                # release the connection when the stream drops or is cancelled
+                async with resp:
+                    resp.raise_for_status()
+                    attempt = 0
+                    if dropped is not None:
+                        self.metrics.stream_reconnects[endpoint] += 1
+                        self.metrics.stream_gap.observe(time.monotonic() - dropped)
+                        self._async_resync(ha_id)
+                    async for event in async_read_events(resp.content):
+                        if self.recorder is not None:
+                            self.recorder.record_event(path, event)
+                        event_callback(event)
+            except ClientResponseError as err:
+                _LOGGER.debug("Event stream %s refused: %s", path, err.status)
+                if err.status == 429:
+                    delay = _retry_after(err.headers or {})
+            except (ClientError, asyncio.TimeoutError) as err:
+                _LOGGER.debug("Event stream %s interrupted: %s", path, err)
+            if dropped is None or attempt == 0:
+                dropped = time.monotonic()
+            if delay is None:
+                delay = min(STREAM_RETRY_DELAY * 2**attempt, STREAM_MAX_RETRY_DELAY)
+                delay = random.uniform(delay / 2, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    @callback
+    def _async_resync(self, ha_id=None):
+        """Refresh the status of the appliance `ha_id`, or of all appliances."""
+        for device_dict in self.devices:
+            device = device_dict[CONF_DEVICE]
+            if not device.initialized or device.appliance.breaker.is_open:
+                continue
+            if ha_id is None or device.appliance.haId == ha_id:
+                self.hass.async_create_task(device.async_refresh_entities())
+
+    @callback
+    def async_update_entity(self, entity):
+        """Update an entity together with the others of this loop iteration.
+
+        All entities updated by the events of one iteration are updated in
+        a single task in the next one, instead of one task per entity and
+        event.
+        """
+        if not self._stale_entities:
+            self.hass.loop.call_soon(self._async_update_stale_entities)
+        # entities are not hashable
+        self._stale_entities[entity.entity_id] = entity
+
+    @callback
+    def _async_update_stale_entities(self):
+        """Start the task updating the stale entities."""
+        entities = list(self._stale_entities.values())
+        self._stale_entities = {}
+        self.hass.async_create_task(self._async_update_entities(entities))
+
+    async def _async_update_entities(self, entities):
+        """Update and write the state of entities that are still added."""
+        for entity in entities:
+            if entity.entity_id not in self.hass.data[DATA_ENTITIES]:
+                continue
+            try:
+                await entity.async_update_ha_state(True)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error updating %s", entity.entity_id)
+
+    @callback
+    def async_initialize_devices(self):
+        """Initialize all devices concurrently in the background."""
+        self._tasks.append(self.hass.loop.create_task(self._async_initialize_devices()))
+
+    async def _async_initialize_devices(self):
+        """Initialize all devices concurrently.
+
+        Devices restored from the snapshot are first reconciled with the
+        live appliance list; if appliances were added, removed or
+        replaced, the config entry is reloaded instead.
+        """
+        start = time.monotonic()
+        if self._restored and not await self._async_reconcile_devices():
+            return
+        await asyncio.gather(
+            *(
+                device_dict[CONF_DEVICE].async_initialize()
+                for device_dict in self.devices
+            )
+        )
+        self.metrics.startup["devices_initialized"] = round(time.monotonic() - start, 3)
+        _LOGGER.debug(
+            "Initialized %s devices in %.2f s",
+            len(self.devices),
+            time.monotonic() - start,
+        )
+        self.async_save_snapshot()
+        await self.async_discover_programs(
+            [
+                device_dict[CONF_DEVICE]
+                for device_dict in self.devices
+                if isinstance(device_dict[CONF_DEVICE], DeviceWithPrograms)
+                and device_dict[CONF_DEVICE].programs_expired
+            ]
+        )
+        if self.replay is not None:
+            self._tasks.append(
+                self.hass.loop.create_task(
+                    self.replay.async_replay_events(self._demux_event, Event)
+                )
+            )
+
+    async def async_discover_programs(self, devices):
+        """Discover the available programs of devices.
+
+        If the programs of a device differ from those its entities were
+        created for, the switch platform is signalled to add and remove
+        its program switches.
+        """
+        if not devices:
+            return
+        changed = await asyncio.gather(
+            *(device.async_refresh_programs() for device in devices)
+        )
+        self.async_save_snapshot()
+        for device, device_changed in zip(devices, changed):
+            if device_changed:
+                _LOGGER.info("Programs of %s have changed", device.appliance.name)
+                async_dispatcher_send(
+                    self.hass,
+                    SIGNAL_PROGRAMS_CHANGED.format(self.config_entry.entry_id),
+                    device,
+                )
+
+    async def _async_reconcile_devices(self):
+        """Compare the restored devices with the live appliance list.
+
+        Return false if the config entry has to be reloaded.
+        """
+        try:
+            appliances = {app.haId: app for app in await self.async_get_appliances()}
+        except (HomeConnectError, ValueError) as err:
+            _LOGGER.debug("Unable to reconcile appliances: %s", err)
+            return True
+        devices = {
+            device_dict[CONF_DEVICE].appliance.haId: device_dict[CONF_DEVICE]
+            for device_dict in self.devices
+        }
+        if {
+            ha_id for ha_id, app in appliances.items() if app.type in DEVICE_CLASSES
+        } != set(devices) or any(
+            appliances[ha_id].type != device.appliance.type
+            for ha_id, device in devices.items()
+        ):
+            _LOGGER.info("Appliances have changed, reloading")
+            # the reload must not restore the outdated snapshot again
+            await self._store.async_remove()
+            self.hass.async_create_task(
+                self.hass.config_entries.async_reload(self.config_entry.entry_id)
+            )
+            return False
+        for ha_id, device in devices.items():
+            device.appliance.connected = appliances[ha_id].connected
+        return True
+
+    async def async_load_devices(self):
+        """Create the devices from the snapshot without any API calls.
+
+        Return false if there is no snapshot.
+        """
+        snapshot = await self._store.async_load()
+        if not snapshot:
+            return False
+        appliances = []
+        for app in snapshot["appliances"]:
+            appliance = HomeConnectAppliance(
+                self,
+                app["haId"],
+                vib=app.get("vib"),
+                brand=app.get("brand"),
+                type=app.get("type"),
+                name=app.get("name"),
+                enumber=app.get("enumber"),
+                # unknown until reconciled with the live appliance list
+                connected=None,
+            )
+            appliances.append(appliance)
+        self._create_devices(
+            appliances, {app["haId"]: app for app in snapshot["appliances"]}
+        )
+        self._restored = True
+        return True
+
+    @callback
+    def async_save_snapshot(self):
+        """Schedule saving the snapshot of the appliances and their status."""
+        self._store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+
+    @callback
+    def _snapshot(self):
+        """Return a compact snapshot of the appliances and their status."""
+        return {
+            "appliances": [
+                device_dict[CONF_DEVICE].as_snapshot() for device_dict in self.devices
+            ]
+        }
+
+    async def async_stop(self):
+        """Stop listening to the event streams and initializing devices."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for device_dict in self.devices:
+            device_dict[CONF_DEVICE].appliance.breaker.async_stop()
+        if self._cancel_token_refresh is not None:
+            self._cancel_token_refresh()
+            self._cancel_token_refresh = None
+        if self.recorder is not None:
+            await self.recorder.async_stop()
+
+    async def async_get_devices(self):
         """Get a dictionary of devices."""
-        appl = self.get_appliances()
+        start = time.monotonic()
+        appl = await self.async_get_appliances()
+        self.metrics.startup["appliances_fetched"] = round(time.monotonic() - start, 3)
+        _LOGGER.debug(
+            "Fetched %s appliances in %.2f s", len(appl), time.monotonic() - start
+        )
+        return self._create_devices(appl)
+
+    def _create_devices(self, appliances, snapshots=None):
+        """Create the devices for a list of appliances.
+
+        With `snapshots`, the devices are restored from the snapshots of
+        their appliances by haId.
+        """
         devices = []
-        for app in appl:
-            if app.type == "Dryer":
-                device = Dryer(self.hass, app)
-            elif app.type == "Washer":
-                device = Washer(self.hass, app)
-            elif app.type == "WasherDryer":
-                device = WasherDryer(self.hass, app)
-            elif app.type == "Dishwasher":
-                device = Dishwasher(self.hass, app)
-            elif app.type == "FridgeFreezer":
-                device = FridgeFreezer(self.hass, app)
-            elif app.type == "Oven":
-                device = Oven(self.hass, app)
-            elif app.type == "CoffeeMaker":
-                device = CoffeeMaker(self.hass, app)
-            elif app.type == "Hood":
-                device = Hood(self.hass, app)
-            elif app.type == "Hob":
-                device = Hob(self.hass, app)
-            else:
+        for app in appliances:
+            device_class = DEVICE_CLASSES.get(app.type)
+            if device_class is None:
                 _LOGGER.warning("Appliance type %s not implemented", app.type)
                 continue
+            device = device_class(self.hass, app)
+            if snapshots is not None:
+                device.restore(snapshots[app.haId])
             devices.append(
                 {CONF_DEVICE: device, CONF_ENTITIES: device.get_entity_info()}
             )
@@ -97,6 +964,361 @@ class ConfigEntryAuth(homeconnect.HomeConnectAPI):
         return devices
 
 
+class HomeConnectAppliance:
+    """Home appliance of a Home Connect account."""
+
+    def __init__(
+        self,
+        hc,
+        haId,
+        vib=None,
+        brand=None,
+        type=None,
+        name=None,
+        enumber=None,
+        connected=False,
+    ):
+        """Initialize the appliance."""
+        self.hc = hc
+        self.haId = haId
+        self.vib = vib or ""
+        self.brand = brand or ""
+        self.type = type or ""
+        self.name = name or ""
+        self.enumber = enumber or ""
+        self.connected = connected
+        self.commands = CommandQueue(self)
+        self.breaker = CircuitBreaker(hc.hass, self._async_probe)
+        self._program_options = {}
+
+    def __repr__(self):
+        """Return the representation of the appliance."""
+        return (
+            f"HomeConnectAppliance(haId='{self.haId}', type='{self.type}', "
+            f"name='{self.name}')"
+        )
+
+    async def _async_call(self, request, endpoint, *args):
+        """Make a request to an endpoint of the appliance through the breaker."""
+        if self.breaker.is_open:
+            raise ApplianceOfflineError(f"{self.name} is offline")
+        try:
+            res = await request(f"{ENDPOINT_APPLIANCES}/{self.haId}{endpoint}", *args)
+        except ApplianceOfflineError:
+            self.breaker.record_failure()
+            raise
+        except ApiConnectionError:
+            # says nothing about the appliance
+            raise
+        except HomeConnectError:
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return res
+
+    async def _async_probe(self):
+        """Return true if the appliance is connected."""
+        try:
+            data = await self.hc.async_get(f"{ENDPOINT_APPLIANCES}/{self.haId}")
+        except (HomeConnectError, ValueError):
+            return False
+        self.connected = data.get("connected", False)
+        return self.connected
+
+    async def async_get(self, endpoint):
+        """Get data (as dictionary) from an endpoint."""
+        return await self._async_call(self.hc.async_get, endpoint)
+
+    async def async_put(self, endpoint, data):
+        """Send (PUT) data to an endpoint."""
+        return await self._async_call(self.hc.async_put, endpoint, data)
+
+    async def async_delete(self, endpoint):
+        """Delete an endpoint."""
+        return await self._async_call(self.hc.async_delete, endpoint)
+
+    async def async_get_status(self):
+        """Get the list of status items."""
+        return (await self.async_get("/status")).get("status", [])
+
+    async def async_get_settings(self):
+        """Get the list of setting items."""
+        return (await self.async_get("/settings")).get("settings", [])
+
+    async def async_get_programs_active(self):
+        """Get the active program, or an empty dictionary if there is none."""
+        try:
+            return await self.async_get("/programs/active")
+        except HomeConnectError as err:
+            error = err.args[0] if err.args else None
+            if (
+                isinstance(error, dict)
+                and error.get(ATTR_KEY) == ERROR_NO_PROGRAM_ACTIVE
+            ):
+                return {}
+            raise
+
+    async def async_get_programs_available(self):
+        """Get the keys of the available programs."""
+        programs = await self.async_get("/programs/available")
+        return [p[ATTR_KEY] for p in programs.get("programs", [])]
+
+    async def async_get_program_options(self, program_key):
+        """Get the options of an available program."""
+        options = await self.async_get(f"/programs/available/{program_key}")
+        return options.get("options", [])
+
+    async def async_get_option_constraints(self, program_key):
+        """Get the options of an available program by key, fetching them once."""
+        if program_key not in self._program_options:
+            options = await self.async_get_program_options(program_key)
+            self._program_options[program_key] = {
+                option[ATTR_KEY]: option for option in options
+            }
+        return self._program_options[program_key]
+
+    @callback
+    def async_invalidate_option_constraints(self):
+        """Forget the cached options of all programs."""
+        self._program_options = {}
+
+    async def async_validate_options(self, program_key, options):
+        """Check options against the constraints of a program.
+
+        Return the options with their values converted to the option
+        types, or raise ValueError if an option is not available or its
+        value is not allowed. If the constraints cannot be fetched, the
+        options are returned unchecked.
+        """
+        try:
+            constraints = await self.async_get_option_constraints(program_key)
+        except (HomeConnectError, ValueError) as err:
+            _LOGGER.debug("Unable to fetch options of %s: %s", program_key, err)
+            return options
+        validated = []
+        for option in options:
+            if option[ATTR_KEY] not in constraints:
+                raise ValueError(
+                    f"{option[ATTR_KEY]} is not an option of {program_key}"
+                )
+            validated.append(
+                {
+                    **option,
+                    ATTR_VALUE: _validate_option(
+                        constraints[option[ATTR_KEY]], option[ATTR_VALUE]
+                    ),
+                }
+            )
+        return validated
+
+    async def async_start_program(self, program_key, options=None):
+        """Start a program."""
+        data = {ATTR_KEY: program_key}
+        if options is not None:
+            data["options"] = options
+        return await self.async_put("/programs/active", {"data": data})
+
+    async def async_stop_program(self):
+        """Stop a program."""
+        return await self.async_delete("/programs/active")
+
+    async def async_select_program(self, program_key, options=None):
+        """Select a program."""
+        data = {ATTR_KEY: program_key}
+        if options is not None:
+            data["options"] = options
+        return await self.async_put("/programs/selected", {"data": data})
+
+    async def async_set_setting(self, setting_key, value, unit=None):
+        """Change the current setting of `setting_key`."""
+        return await self.commands.async_write(
+            WRITE_SETTING, _key_value(setting_key, value, unit)
+        )
+
+    async def async_set_active_program_options(self, options):
+        """Change several options of the active program in one request."""
+        return await self.commands.async_write_many(WRITE_ACTIVE_OPTION, options)
+
+    async def async_set_selected_program_options(self, options):
+        """Change several options of the selected program in one request."""
+        return await self.commands.async_write_many(WRITE_SELECTED_OPTION, options)
+
+    async def async_execute_command(self, command):
+        """Execute a command."""
+        return await self.async_put(
+            f"/commands/{command}", {"data": {ATTR_KEY: command, ATTR_VALUE: True}}
+        )
+
+
+class CommandQueue:
+    """Queue of the setting and option writes of an appliance.
+
+    Writes are sent one after another in the order they were queued.
+    A write to a key that is still pending replaces the pending value
+    (the last value wins), and pending option writes of the same program
+    are sent together in one request.
+    """
+
+    def __init__(self, appliance):
+        """Initialize the command queue."""
+        self._appliance = appliance
+        self._pending = {}
+        self._worker = None
+
+    async def async_write(self, path, item):
+        """Queue a write of a key/value item to `path` and wait until it is sent."""
+        return await self._queue(path, item)
+
+    async def async_write_many(self, path, items):
+        """Queue writes of key/value items to `path` and wait until they are sent.
+
+        Option writes queued together are sent in one request.
+        """
+        results = await asyncio.gather(*(self._queue(path, item) for item in items))
+        return results[-1] if results else None
+
+    def _queue(self, path, item):
+        """Queue a write and return the future of its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        _, futures = self._pending.get((path, item[ATTR_KEY]), (None, []))
+        self._pending[(path, item[ATTR_KEY])] = (item, futures + [future])
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._async_process())
+        return future
+
+    async def _async_process(self):
+        """Send the pending writes."""
+        while self._pending:
+            path, key = next(iter(self._pending))
+            batch = [(key, *self._pending.pop((path, key)))]
+            if path in BATCH_WRITES:
+                batch += [
+                    (other_key, *self._pending.pop((other_path, other_key)))
+                    for other_path, other_key in list(self._pending)
+                    if other_path == path
+                ]
+            futures = [
+                future for _, _, batch_futures in batch for future in batch_futures
+            ]
+            try:
+                if len(batch) == 1:
+                    result = await self._appliance.async_put(
+                        f"{path}/{key}", {"data": batch[0][1]}
+                    )
+                else:
+                    result = await self._appliance.async_put(
+                        path, {"data": {"options": [item for _, item, _ in batch]}}
+                    )
+            except Exception as err:  # pylint: disable=broad-except
+                # fail the waiting writes instead of the worker
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(err)
+            else:
+                for future in futures:
+                    if not future.done():
+                        future.set_result(result)
+
+
+def _key_value(key, value, unit=None):
+    """Return the request data for a key/value item."""
+    data = {ATTR_KEY: key, ATTR_VALUE: value}
+    if unit is not None:
+        data[ATTR_UNIT] = unit
+    return data
+
+
+def _validate_option(option, value):
+    """Return `value` converted to the type of `option`.
+
+    Raise ValueError if the value violates the constraints of the option.
+    """
+    key = option[ATTR_KEY]
+    constraints = option.get("constraints", {})
+    option_type = option.get("type")
+    if option_type in ("Int", "Double"):
+        try:
+            number = float(value)
+        except (TypeError, ValueError) as err:
+            raise ValueError(f"{key} must be a number, not {value}") from err
+        if "min" in constraints and number < constraints["min"]:
+            raise ValueError(f"{key} must be at least {constraints['min']}")
+        if "max" in constraints and number > constraints["max"]:
+            raise ValueError(f"{key} must be at most {constraints['max']}")
+        step = constraints.get("stepsize")
+        if step:
+            steps = (number - constraints.get("min", 0)) / step
+            if abs(steps - round(steps)) > 1e-9:
+                raise ValueError(f"{key} must be a multiple of {step}")
+        if option_type == "Int":
+            if not number.is_integer():
+                raise ValueError(f"{key} must be an integer, not {value}")
+            value = int(number)
+        else:
+            value = number
+    elif option_type == "Boolean" and not isinstance(value, bool):
+        if str(value).lower() not in ("true", "false"):
+            raise ValueError(f"{key} must be true or false, not {value}")
+        value = str(value).lower() == "true"
+    allowed = constraints.get("allowedvalues")
+    if allowed and value not in allowed:
+        raise ValueError(f"{key} must be one of {', '.join(map(str, allowed))}")
+    return value
+
+
+def _is_offline(result, message):
+    """Return true if `result` is an error of an unreachable appliance.
+
+    Any other exception returned by `asyncio.gather` is raised.
+    """
+    if isinstance(result, (HomeConnectError, ValueError)):
+        _LOGGER.debug(message)
+        return True
+    if isinstance(result, BaseException):
+        raise result
+    return False
+
+
+class ApplianceStatus(dict):
+    """Status of an appliance, keyed by Home Connect key.
+
+    Holds the status, settings and active program of an appliance. It is
+    owned by the integration and updated incrementally from the key/value
+    items of REST responses and events.
+    """
+
+    def apply(self, items):
+        """Apply a list of key/value items and return the keys that changed value."""
+        changed = set()
+        for item in items:
+            item = dict(item)
+            key = item.pop(ATTR_KEY, None)
+            if key is None:
+                continue
+            if key not in self or self[key].get(ATTR_VALUE) != item.get(ATTR_VALUE):
+                changed.add(key)
+            self[key] = item
+        return changed
+
+    def remove(self, keys):
+        """Remove keys and return the keys that were present."""
+        removed = {key for key in keys if key in self}
+        for key in removed:
+            del self[key]
+        return removed
+
+    def as_items(self):
+        """Return the status as a compact list of key/value items."""
+        items = []
+        for key, item in self.items():
+            compact = {ATTR_KEY: key, ATTR_VALUE: item.get(ATTR_VALUE)}
+            if item.get(ATTR_UNIT) is not None:
+                compact[ATTR_UNIT] = item[ATTR_UNIT]
+            items.append(compact)
+        return items
+
+
 class HomeConnectDevice:
     """Generic Home Connect device."""
 
@@ -109,42 +1331,268 @@ class HomeConnectDevice:
         self.hass = hass
         self.appliance = appliance
         self.entities = []
+        self.status = ApplianceStatus()
+        self.initialized = False
+        self._pending_commands = {}
+        appliance.breaker.on_close = self._async_reconnected
 
-    def initialize(self):
-        """Fetch the info needed to initialize the device."""
-        try:
-            self.appliance.get_status()
-        except (HomeConnectError, ValueError):
-            _LOGGER.debug("Unable to fetch appliance status. Probably offline")
-        try:
-            self.appliance.get_settings()
-        except (HomeConnectError, ValueError):
-            _LOGGER.debug("Unable to fetch settings. Probably offline")
-        try:
-            program_active = self.appliance.get_programs_active()
-        except (HomeConnectError, ValueError):
-            _LOGGER.debug("Unable to fetch active programs. Probably offline")
+    def as_snapshot(self):
+        """Return a compact snapshot of the appliance and its status."""
+        return {
+            "haId": self.appliance.haId,
+            "vib": self.appliance.vib,
+            "brand": self.appliance.brand,
+            "type": self.appliance.type,
+            "name": self.appliance.name,
+            "enumber": self.appliance.enumber,
+            "status": self.status.as_items(),
+        }
+
+    def restore(self, snapshot):
+        """Restore the status from a snapshot."""
+        self.status.apply(snapshot.get("status", []))
+        self.initialized = True
+
+    async def async_initialize(self):
+        """Fetch the info needed to initialize the device.
+
+        Appliances known to be offline are not contacted until they are
+        connected again.
+        """
+        if self.appliance.connected is False:
+            self.appliance.breaker.async_open()
+        await self.async_refresh()
+        self.appliance.hc.async_listen_appliance_events(
+            self.appliance.haId, self.event_callback
+        )
+        self.initialized = True
+        async_dispatcher_send(
+            self.hass, SIGNAL_UPDATE_ENTITIES.format(self.appliance.haId), None
+        )
+
+    async def async_refresh(self):
+        """Fetch the status and return the keys that changed.
+
+        Status, settings and the active program are fetched concurrently.
+        If no program is active, the active program and the program
+        options are cleared; if the appliance is offline, they are kept.
+        """
+        status, settings, program_active = await asyncio.gather(
+            self.appliance.async_get_status(),
+            self.appliance.async_get_settings(),
+            self.appliance.async_get_programs_active(),
+            return_exceptions=True,
+        )
+        if _is_offline(status, "Unable to fetch appliance status. Probably offline"):
+            status = []
+        if _is_offline(settings, "Unable to fetch settings. Probably offline"):
+            settings = []
+        if _is_offline(
+            program_active, "Unable to fetch active programs. Probably offline"
+        ):
             program_active = None
-        if program_active and ATTR_KEY in program_active:
-            self.appliance.status[BSH_ACTIVE_PROGRAM] = {
-                ATTR_VALUE: program_active[ATTR_KEY]
-            }
-        self.appliance.listen_events(callback=self.event_callback)
+        keys = self.status.apply(status) | self.status.apply(settings)
+        if program_active is None:
+            return keys
+        if ATTR_KEY in program_active:
+            keys |= self.status.apply(
+                [{ATTR_KEY: BSH_ACTIVE_PROGRAM, ATTR_VALUE: program_active[ATTR_KEY]}]
+                + program_active.get("options", [])
+            )
+        else:
+            keys |= self.status.apply(
+                [{ATTR_KEY: BSH_ACTIVE_PROGRAM, ATTR_VALUE: None}]
+            )
+            keys |= self.status.remove(
+                [key for key in self.status if ".Option." in key]
+            )
+        return keys
+
+    @callback
+    def _async_reconnected(self):
+        """Refresh the status of an appliance that is reachable again."""
+        _LOGGER.debug("%s is reachable again", self.appliance.name)
+        self.hass.async_create_task(self.async_refresh_entities())
+
+    async def async_refresh_entities(self):
+        """Refresh the status and signal the entities of changed keys."""
+        keys = await self.async_refresh()
+        if keys:
+            self.appliance.hc.async_save_snapshot()
+            self._async_update_entities(keys)
+
+    @callback
+    def event_callback(self, event):
+        """Handle event.
+
+        Applies the items of status, event and notify messages to the
+        status and only signals the entities if a value actually changed.
+        """
+        received = time.monotonic()
+        self.appliance.hc.metrics.record_event(self.appliance.haId)
+        if event.event in (EVENT_TYPE_CONNECTED, EVENT_TYPE_PAIRED):
+            self.appliance.connected = True
+            # options may have changed with a firmware update
+            self.appliance.async_invalidate_option_constraints()
+            self.appliance.breaker.async_close()
+            return
+        if event.event == EVENT_TYPE_DISCONNECTED:
+            self.appliance.connected = False
+            self.appliance.breaker.async_open()
+            return
+        if event.event not in EVENT_TYPES_STATUS or not event.data:
+            return
+        try:
+            items = json.loads(event.data).get("items", [])
+        except ValueError:
+            _LOGGER.debug("Unable to parse event data: %s", event.data)
+            return
+        self._async_confirm(items)
+        keys = self.status.apply(items)
+        _LOGGER.debug("Update triggered on %s: %s", self.appliance.name, keys)
+        if keys:
+            self.appliance.hc.async_save_snapshot()
+            self._async_update_entities(keys, received)
+
+    @callback
+    def _async_update_entities(self, keys, received=None):
+        """Signal the entities that the status of `keys` has changed.
+
+        `received` is the time the event causing the change arrived.
+        """
+        if keys:
+            async_dispatcher_send(
+                self.hass,
+                SIGNAL_UPDATE_ENTITIES.format(self.appliance.haId),
+                keys,
+                received,
+            )
+
+    @callback
+    def async_set_optimistic(self, key, value):
+        """Show a commanded value until an event confirms it.
+
+        The value is applied to the status right away. If no event
+        confirms it within CONFIRMATION_TIMEOUT, the previous value is
+        restored.
+        """
+        previous = self.status.get(key)
+        pending = self._pending_commands.pop(key, None)
+        if pending is not None:
+            pending.cancel()
+            previous = pending.previous
+        self._pending_commands[key] = PendingCommand(
+            value,
+            previous,
+            time.monotonic(),
+            async_call_later(
+                self.hass, CONFIRMATION_TIMEOUT, partial(self._async_timeout, key)
+            ),
+        )
+        self._async_update_entities(
+            self.status.apply([{ATTR_KEY: key, ATTR_VALUE: value}])
+        )
+
+    @callback
+    def async_rollback(self, key):
+        """Restore the value of `key` from before a pending command."""
+        pending = self._pending_commands.pop(key, None)
+        if pending is None:
+            return
+        pending.cancel()
+        if pending.previous is None:
+            self.status.pop(key, None)
+            self._async_update_entities({key})
+        else:
+            self._async_update_entities(
+                self.status.apply([{ATTR_KEY: key, **pending.previous}])
+            )
 
-    def event_callback(self, appliance):
-        """Handle event."""
-        _LOGGER.debug("Update triggered on %s", appliance.name)
-        _LOGGER.debug(self.appliance.status)
-        dispatcher_send(self.hass, SIGNAL_UPDATE_ENTITIES, appliance.haId)
+    @callback
+    def _async_timeout(self, key, _now):
+        """Roll back a command that has not been confirmed in time."""
+        _LOGGER.debug("%s of %s not confirmed, rolling back", key, self.appliance.name)
+        self.async_rollback(key)
+
+    @callback
+    def _async_confirm(self, items):
+        """Resolve the pending commands of the keys of event items."""
+        for item in items:
+            pending = self._pending_commands.pop(item.get(ATTR_KEY), None)
+            if pending is None:
+                continue
+            pending.cancel()
+            if item.get(ATTR_VALUE) == pending.value:
+                self.appliance.hc.metrics.confirmation_latency.observe(
+                    time.monotonic() - pending.start
+                )
 
 
 class DeviceWithPrograms(HomeConnectDevice):
-    """Device with programs."""
+    """Device with programs.
+
+    The available programs are discovered from the appliance and cached
+    for PROGRAMS_TTL in the snapshot; until then, PROGRAMS is used.
+    """
 
     PROGRAMS = []
 
+    def __init__(self, hass, appliance):
+        """Initialize the device class."""
+        super().__init__(hass, appliance)
+        self.programs = None
+        self.programs_fetched = 0
+        self._programs_in_use = []
+
+    @property
+    def programs_expired(self):
+        """Return true if the discovered programs are missing or outdated."""
+        return time.time() - self.programs_fetched > PROGRAMS_TTL
+
+    def as_snapshot(self):
+        """Return a compact snapshot including the discovered programs."""
+        snapshot = super().as_snapshot()
+        if self.programs is not None:
+            snapshot["programs"] = self.programs
+            snapshot["programs_fetched"] = self.programs_fetched
+        return snapshot
+
+    def restore(self, snapshot):
+        """Restore the status and the discovered programs from a snapshot."""
+        super().restore(snapshot)
+        self.programs = snapshot.get("programs")
+        self.programs_fetched = snapshot.get("programs_fetched", 0)
+
+    async def async_refresh_programs(self):
+        """Discover the available programs.
+
+        Return true if they differ from the programs in use. An appliance
+        that is offline or reports no programs keeps the known ones.
+        """
+        try:
+            programs = await self.appliance.async_get_programs_available()
+        except (HomeConnectError, ValueError) as err:
+            _LOGGER.debug("Unable to fetch programs of %s: %s", self.appliance, err)
+            return False
+        if not programs:
+            return False
+        self.programs = programs
+        self.programs_fetched = time.time()
+        return set(programs) != set(self._programs_in_use)
+
+    @callback
+    def event_callback(self, event):
+        """Handle event, discovering the programs when (re)connected."""
+        super().event_callback(event)
+        if event.event in (EVENT_TYPE_CONNECTED, EVENT_TYPE_PAIRED):
+            self.hass.async_create_task(
+                self.appliance.hc.async_discover_programs([self])
+            )
+
     def get_programs_available(self):
         """Get the available programs."""
+        if self.programs is not None:
+            return [{"name": program} for program in self.programs]
         return self.PROGRAMS
 
     def get_program_switches(self):
@@ -153,6 +1601,7 @@ class DeviceWithPrograms(HomeConnectDevice):
         There will be one switch for each program.
         """
         programs = self.get_programs_available()
+        self._programs_in_use = [p["name"] for p in programs]
         return [{ATTR_DEVICE: self, "program_name": p["name"]} for p in programs]
 
     def get_program_sensors(self):
@@ -608,3 +2057,16 @@ class Hob(DeviceWithOpState, DeviceWithPrograms, DeviceWithRemoteControl):
             "switch": program_switches,
             "sensor": program_sensors + op_state_sensor,
         }
+
+
+DEVICE_CLASSES = {
+    "Dryer": Dryer,
+    "Washer": Washer,
+    "WasherDryer": WasherDryer,
+    "Dishwasher": Dishwasher,
+    "FridgeFreezer": FridgeFreezer,
+    "Oven": Oven,
+    "CoffeeMaker": CoffeeMaker,
+    "Hood": Hood,
+    "Hob": Hob,
+}
@@ -30,7 +30,7 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
             entities += [HomeConnectBinarySensor(**d) for d in entity_dicts]
         return entities
 
-    async_add_entities(await hass.async_add_executor_job(get_entities), True)
+    async_add_entities(get_entities(), True)
 
 
 class HomeConnectBinarySensor(HomeConnectEntity, BinarySensorEntity):
@@ -55,6 +55,11 @@ class HomeConnectBinarySensor(HomeConnectEntity, BinarySensorEntity):
             self._false_value_list = [False]
             self._true_value_list = [True]
 
+    @property
+    def status_keys(self):
+        """Return the status keys the entity state is derived from."""
+        return {self._update_key}
+
     @property
     def is_on(self):
         """Return true if the binary sensor is on."""
@@ -63,11 +68,11 @@ class HomeConnectBinarySensor(HomeConnectEntity, BinarySensorEntity):
     @property
     def available(self):
         """Return true if the binary sensor is available."""
-        return self._state is not None
+        return super().available and self._state is not None
 
     async def async_update(self):
         """Update the binary sensor's status."""
-        state = self.device.appliance.status.get(self._update_key, {})
+        state = self.device.status.get(self._update_key, {})
         if not state:
             self._state = None
         elif state.get(ATTR_VALUE) in self._false_value_list:
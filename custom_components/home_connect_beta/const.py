@@ -2,14 +2,50 @@
 
 DOMAIN = "home_connect_beta"
 
-OAUTH2_AUTHORIZE = "https://api.home-connect.com/security/oauth/authorize"
-OAUTH2_TOKEN = "https://api.home-connect.com/security/oauth/token"
+API_URL = "https://api.home-connect.com"
+
+OAUTH2_AUTHORIZE = "/security/oauth/authorize"
+OAUTH2_TOKEN = "/security/oauth/token"
+
+CONF_API_URL = "api_url"
+CONF_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
+CONF_MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
+CONF_MIN_DELTA = "min_delta"
+CONF_MIN_INTERVAL = "min_interval"
+CONF_RATE_LIMIT_DAY = "rate_limit_per_day"
+CONF_RATE_LIMIT_MINUTE = "rate_limit_per_minute"
+CONF_RECORD_FILE = "record_file"
+CONF_REPLAY_FILE = "replay_file"
+CONF_REPLAY_SPEED = "replay_speed"
+CONF_SENSOR_THROTTLE = "sensor_throttle"
+CONF_SINGLE_EVENT_STREAM = "single_event_stream"
+CONF_TOKEN_REFRESH_MARGIN = "token_refresh_margin"
+
+DATA_CONFIG = "home_connect_beta_config"
+DATA_ENTITIES = "home_connect_beta_entities"
+
+DEFAULT_DIAGNOSTIC_SENSORS = False
+DEFAULT_MAX_CONCURRENT_REQUESTS = 5
+# see https://developer.home-connect.com/docs/general/ratelimiting
+DEFAULT_RATE_LIMIT_DAY = 1000
+DEFAULT_RATE_LIMIT_MINUTE = 50
+DEFAULT_REPLAY_SPEED = 1.0
+DEFAULT_SINGLE_EVENT_STREAM = True
+DEFAULT_TOKEN_REFRESH_MARGIN = 600
+DEFAULT_SENSOR_THROTTLE = {
+    "BSH.Common.Option.ProgramProgress": {CONF_MIN_DELTA: 1},
+    "BSH.Common.Option.RemainingProgramTime": {CONF_MIN_DELTA: 60},
+}
+
+STORAGE_KEY = "home_connect_beta.{}"
+STORAGE_VERSION = 1
 
 BSH_POWER_STATE = "BSH.Common.Setting.PowerState"
 BSH_POWER_ON = "BSH.Common.EnumType.PowerState.On"
 BSH_POWER_OFF = "BSH.Common.EnumType.PowerState.Off"
 BSH_POWER_STANDBY = "BSH.Common.EnumType.PowerState.Standby"
 BSH_ACTIVE_PROGRAM = "BSH.Common.Root.ActiveProgram"
+BSH_SELECTED_PROGRAM = "BSH.Common.Root.SelectedProgram"
 BSH_OPERATION_STATE = "BSH.Common.Status.OperationState"
 BSH_REMOTE_CONTROL_ACTIVATION_STATE = "BSH.Common.Status.RemoteControlActive"
 BSH_REMOTE_START_ALLOWANCE_STATE = "BSH.Common.Status.RemoteControlStartAllowed"
@@ -33,8 +69,20 @@ BSH_DOOR_STATE_OPEN = "BSH.Common.EnumType.DoorState.Open"
 BSH_PAUSE = "BSH.Common.Command.PauseProgram"
 BSH_RESUME = "BSH.Common.Command.ResumeProgram"
 
-SIGNAL_UPDATE_ENTITIES = "home_connect_beta.update_entities"
+EVENT_TYPE_CONNECTED = "CONNECTED"
+EVENT_TYPE_DISCONNECTED = "DISCONNECTED"
+EVENT_TYPE_EVENT = "EVENT"
+EVENT_TYPE_NOTIFY = "NOTIFY"
+EVENT_TYPE_PAIRED = "PAIRED"
+EVENT_TYPE_STATUS = "STATUS"
+EVENT_TYPES_STATUS = (EVENT_TYPE_STATUS, EVENT_TYPE_EVENT, EVENT_TYPE_NOTIFY)
+
+SIGNAL_PROGRAMS_CHANGED = "home_connect_beta.programs_changed_{}"
+SIGNAL_UPDATE_ENTITIES = "home_connect_beta.update_entities_{}"
+
+EVENT_BULK_RESULT = "home_connect_beta_bulk_result"
 
+SERVICE_BULK = "bulk"
 SERVICE_OPTION_ACTIVE = "set_option_active"
 SERVICE_OPTION_SELECTED = "set_option_selected"
 SERVICE_PAUSE = "pause_program"
@@ -43,14 +91,19 @@ SERVICE_SELECT = "select_program"
 SERVICE_SETTING = "change_setting"
 SERVICE_START = "start_program"
 
+ATTR_ACTION = "action"
 ATTR_AMBIENT = "ambient"
 ATTR_DESC = "desc"
 ATTR_DEVICE = "device"
+ATTR_ERROR = "error"
+ATTR_HA_ID = "ha_id"
+ATTR_ITEMS = "items"
 ATTR_KEY = "key"
 ATTR_OPTIONS = "options"
 ATTR_PROGRAM = "program"
 ATTR_SENSOR_TYPE = "sensor_type"
 ATTR_SIGN = "sign"
+ATTR_SUCCESS = "success"
 ATTR_UNIT = "unit"
 ATTR_VALUE = "value"
 
@@ -0,0 +1,35 @@
+"""Diagnostics support for Home Connect."""
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_DEVICE
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict:
+    """Return the performance metrics of a config entry."""
+    hc_api = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "appliances": [
+            {
+                "haId": device.appliance.haId,
+                "type": device.appliance.type,
+                "name": device.appliance.name,
+                "connected": device.appliance.connected,
+                "offline": device.appliance.breaker.is_open,
+                "failures": device.appliance.breaker.failures,
+                "initialized": device.initialized,
+                "entities": len(device.entities),
+            }
+            for device in (device_dict[CONF_DEVICE] for device_dict in hc_api.devices)
+        ],
+        "rate_limit": {
+            "remaining_minute": hc_api.rate_limiter.remaining_minute,
+            "remaining_day": hc_api.rate_limiter.remaining_day,
+            "rate_limited": hc_api.rate_limiter.rate_limited,
+        },
+        "metrics": hc_api.metrics.as_dict(),
+    }
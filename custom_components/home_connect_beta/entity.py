@@ -1,13 +1,14 @@
 """Home Connect entity base class."""
 
 import logging
+import time
 
 from homeassistant.core import callback
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import Entity
 
-from .api import HomeConnectDevice
-from .const import DOMAIN, SIGNAL_UPDATE_ENTITIES
+from .api import HomeConnectDevice, HomeConnectError
+from .const import DATA_ENTITIES, DOMAIN, SIGNAL_UPDATE_ENTITIES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,22 +21,54 @@ class HomeConnectEntity(Entity):
         self.device = device
         self.desc = desc
         self._name = f"{self.device.appliance.name} {desc}"
+        self._event_received = None
         self.device.entities.append(self)
 
     async def async_added_to_hass(self):
         """Register callbacks."""
+        self.hass.data[DATA_ENTITIES][self.entity_id] = self.device
         self.async_on_remove(
             async_dispatcher_connect(
-                self.hass, SIGNAL_UPDATE_ENTITIES, self._update_callback
+                self.hass,
+                SIGNAL_UPDATE_ENTITIES.format(self.device.appliance.haId),
+                self._update_callback,
             )
         )
 
+    async def async_will_remove_from_hass(self):
+        """Unregister the entity from the entity index and its device."""
+        self.hass.data[DATA_ENTITIES].pop(self.entity_id, None)
+        if self in self.device.entities:
+            self.device.entities.remove(self)
+
+    @property
+    def status_keys(self):
+        """Return the status keys the entity state is derived from."""
+        return set()
+
     @callback
-    def _update_callback(self, ha_id):
-        """Update data."""
-        if ha_id == self.device.appliance.haId:
+    def _update_callback(self, keys=None, received=None):
+        """Update data if one of the entity's status keys has changed."""
+        if keys is None or not keys.isdisjoint(self.status_keys):
+            # the lag is measured from the first event of a batched update
+            if self._event_received is None:
+                self._event_received = received
             self.async_entity_update()
 
+    async def async_update_ha_state(self, force_refresh=False):
+        """Update and write the state, recording the lag since the triggering event."""
+        received, self._event_received = self._event_received, None
+        await super().async_update_ha_state(force_refresh)
+        if received is not None:
+            self.device.appliance.hc.metrics.event_lag.observe(
+                time.monotonic() - received
+            )
+
+    @property
+    def available(self):
+        """Return true if the device has been initialized."""
+        return self.device.initialized
+
     @property
     def should_poll(self):
         """No polling needed."""
@@ -61,8 +94,17 @@ class HomeConnectEntity(Entity):
             "model": self.device.appliance.vib,
         }
 
+    async def async_set_setting(self, key, value):
+        """Change a setting, showing the new value until an event confirms it."""
+        self.device.async_set_optimistic(key, value)
+        try:
+            await self.device.appliance.async_set_setting(key, value)
+        except HomeConnectError:
+            self.device.async_rollback(key)
+            raise
+
     @callback
     def async_entity_update(self):
         """Update the entity."""
         _LOGGER.debug("Entity update triggered on %s", self)
-        self.async_schedule_update_ha_state(True)
+        self.device.appliance.hc.async_update_entity(self)
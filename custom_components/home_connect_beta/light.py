@@ -2,8 +2,6 @@
 import logging
 from math import ceil
 
-from homeconnect.api import HomeConnectError
-
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
     ATTR_HS_COLOR,
@@ -14,6 +12,7 @@ from homeassistant.components.light import (
 from homeassistant.const import CONF_ENTITIES
 import homeassistant.util.color as color_util
 
+from .api import HomeConnectError
 from .const import (
     ATTR_VALUE,
     BSH_AMBIENT_LIGHT_BRIGHTNESS,
@@ -43,7 +42,7 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
             entities += entity_list
         return entities
 
-    async_add_entities(await hass.async_add_executor_job(get_entities), True)
+    async_add_entities(get_entities(), True)
 
 
 class HomeConnectLight(HomeConnectEntity, LightEntity):
@@ -67,6 +66,18 @@ class HomeConnectLight(HomeConnectEntity, LightEntity):
             self._custom_color_key = None
             self._color_key = None
 
+    @property
+    def status_keys(self):
+        """Return the status keys the entity state is derived from."""
+        keys = {
+            self._key,
+            self._brightness_key,
+            self._custom_color_key,
+            self._color_key,
+        }
+        keys.discard(None)
+        return keys
+
     @property
     def is_on(self):
         """Return true if the light is on."""
@@ -94,16 +105,13 @@ class HomeConnectLight(HomeConnectEntity, LightEntity):
         if self._ambient:
             _LOGGER.debug("Switching ambient light on for: %s", self.name)
             try:
-                await self.hass.async_add_executor_job(
-                    self.device.appliance.set_setting, self._key, True
-                )
+                await self.async_set_setting(self._key, True)
             except HomeConnectError as err:
                 _LOGGER.error("Error while trying to turn on ambient light: %s", err)
                 return
             if ATTR_BRIGHTNESS in kwargs or ATTR_HS_COLOR in kwargs:
                 try:
-                    await self.hass.async_add_executor_job(
-                        self.device.appliance.set_setting,
+                    await self.async_set_setting(
                         self._color_key,
                         BSH_AMBIENT_LIGHT_COLOR_CUSTOM_COLOR,
                     )
@@ -120,8 +128,7 @@ class HomeConnectLight(HomeConnectEntity, LightEntity):
                         rgb = color_util.color_hsv_to_RGB(*hs_color, brightness)
                         hex_val = color_util.color_rgb_to_hex(rgb[0], rgb[1], rgb[2])
                         try:
-                            await self.hass.async_add_executor_job(
-                                self.device.appliance.set_setting,
+                            await self.async_set_setting(
                                 self._custom_color_key,
                                 f"#{hex_val}",
                             )
@@ -134,38 +141,29 @@ class HomeConnectLight(HomeConnectEntity, LightEntity):
             _LOGGER.debug("Changing brightness for: %s", self.name)
             brightness = 10 + ceil(kwargs[ATTR_BRIGHTNESS] / 255 * 90)
             try:
-                await self.hass.async_add_executor_job(
-                    self.device.appliance.set_setting, self._brightness_key, brightness
-                )
+                await self.async_set_setting(self._brightness_key, brightness)
             except HomeConnectError as err:
                 _LOGGER.error("Error while trying set the brightness: %s", err)
         else:
             _LOGGER.debug("Switching light on for: %s", self.name)
             try:
-                await self.hass.async_add_executor_job(
-                    self.device.appliance.set_setting, self._key, True
-                )
+                await self.async_set_setting(self._key, True)
             except HomeConnectError as err:
                 _LOGGER.error("Error while trying to turn on light: %s", err)
 
-        self.async_entity_update()
-
     async def async_turn_off(self, **kwargs):
         """Switch the light off."""
         _LOGGER.debug("Switching light off for: %s", self.name)
         try:
-            await self.hass.async_add_executor_job(
-                self.device.appliance.set_setting, self._key, False
-            )
+            await self.async_set_setting(self._key, False)
         except HomeConnectError as err:
             _LOGGER.error("Error while trying to turn off light: %s", err)
-        self.async_entity_update()
 
     async def async_update(self):
         """Update the light's status."""
-        if self.device.appliance.status.get(self._key, {}).get(ATTR_VALUE) is True:
+        if self.device.status.get(self._key, {}).get(ATTR_VALUE) is True:
             self._state = True
-        elif self.device.appliance.status.get(self._key, {}).get(ATTR_VALUE) is False:
+        elif self.device.status.get(self._key, {}).get(ATTR_VALUE) is False:
             self._state = False
         else:
             self._state = None
@@ -173,13 +171,13 @@ class HomeConnectLight(HomeConnectEntity, LightEntity):
         _LOGGER.debug("Updated, new light state: %s", self._state)
 
         if self._ambient:
-            color = self.device.appliance.status.get(self._custom_color_key, {})
+            color = self.device.status.get(self._custom_color_key, {}).get(ATTR_VALUE)
 
             if not color:
                 self._hs_color = None
                 self._brightness = None
             else:
-                colorvalue = color.get(ATTR_VALUE)[1:]
+                colorvalue = color[1:]
                 rgb = color_util.rgb_hex_to_rgb_list(colorvalue)
                 hsv = color_util.color_RGB_to_hsv(rgb[0], rgb[1], rgb[2])
                 self._hs_color = [hsv[0], hsv[1]]
@@ -187,9 +185,12 @@ class HomeConnectLight(HomeConnectEntity, LightEntity):
                 _LOGGER.debug("Updated, new brightness: %s", self._brightness)
 
         else:
-            brightness = self.device.appliance.status.get(self._brightness_key, {})
+            # the status is empty until the device is initialized
+            brightness = self.device.status.get(self._brightness_key, {}).get(
+                ATTR_VALUE
+            )
             if brightness is None:
                 self._brightness = None
             else:
-                self._brightness = ceil((brightness.get(ATTR_VALUE) - 10) * 255 / 90)
+                self._brightness = ceil((brightness - 10) * 255 / 90)
             _LOGGER.debug("Updated, new brightness: %s", self._brightness)
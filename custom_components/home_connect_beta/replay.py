@@ -0,0 +1,194 @@
+"""Recording and replay of the Home Connect API traffic.
+
+The recording is a JSON lines file with one record per REST response
+(`"k": "r"`) or event stream event (`"k": "e"`), each with the time it
+was received.
+"""
+
+import asyncio
+from collections import defaultdict, deque
+import json
+import logging
+import time
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+
+RECORD_FLUSH_DELAY = 1
+RECORD_RESPONSE = "r"
+RECORD_EVENT = "e"
+# events replayed as fast as possible between two yields to the event loop
+REPLAY_BATCH = 10
+
+
+class EventRecorder:
+    """Append the API traffic to a recording file."""
+
+    def __init__(self, hass, path):
+        """Initialize the recorder."""
+        self.hass = hass
+        self.path = path
+        self._buffer = []
+        self._cancel_flush = None
+
+    @callback
+    def record_response(self, method, path, status, content):
+        """Record the response to a REST request."""
+        self._async_record(
+            {
+                "k": RECORD_RESPONSE,
+                "m": method,
+                "p": path,
+                "s": status,
+                "d": content.decode(errors="replace"),
+            }
+        )
+
+    @callback
+    def record_event(self, path, event):
+        """Record an event of the event stream `path`."""
+        self._async_record(
+            {
+                "k": RECORD_EVENT,
+                "p": path,
+                "e": event.event,
+                "i": event.id,
+                "d": event.data,
+            }
+        )
+
+    @callback
+    def _async_record(self, record):
+        """Buffer a record and schedule writing the buffer."""
+        record["t"] = round(time.time(), 3)
+        self._buffer.append(json.dumps(record, separators=(",", ":")))
+        if self._cancel_flush is None:
+            self._cancel_flush = async_call_later(
+                self.hass, RECORD_FLUSH_DELAY, self._async_flush
+            )
+
+    @callback
+    def _async_flush(self, _now=None):
+        """Write the buffered records in the executor."""
+        self._cancel_flush = None
+        lines, self._buffer = self._buffer, []
+        if lines:
+            self.hass.async_add_executor_job(self._write, lines)
+
+    def _write(self, lines):
+        """Append lines to the recording."""
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+    async def async_stop(self):
+        """Write the remaining records."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+        lines, self._buffer = self._buffer, []
+        if lines:
+            await self.hass.async_add_executor_job(self._write, lines)
+
+
+class ReplayResponse:
+    """Recorded response to a REST request."""
+
+    def __init__(self, status, content):
+        """Initialize the response."""
+        self.status = status
+        self.headers = {}
+        self._content = content.encode()
+
+    async def read(self):
+        """Return the content of the response."""
+        return self._content
+
+
+class ReplaySession:
+    """Stand-in for the OAuth2 session answering from a recording.
+
+    Requests are answered with the recorded responses to the same method
+    and path in order, repeating the last one; unrecorded requests get
+    an empty 204 response. The recorded events are passed on by
+    `async_replay_events`.
+    """
+
+    def __init__(self, hass, path, speed=1.0):
+        """Initialize the session.
+
+        The events are replayed at `speed` times the original timing, or
+        as fast as possible if `speed` is 0.
+        """
+        self.hass = hass
+        self.path = path
+        self.speed = speed
+        self.finished = asyncio.Event()
+        self.replayed = 0
+        self.duration = None
+        self._responses = None
+        self._events = None
+        self._load_lock = asyncio.Lock()
+
+    async def _async_load(self):
+        """Load the recording on first use."""
+        async with self._load_lock:
+            if self._responses is None:
+                self._responses, self._events = await self.hass.async_add_executor_job(
+                    self._read
+                )
+
+    def _read(self):
+        """Read the responses and events of the recording."""
+        responses = defaultdict(deque)
+        events = []
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["k"] == RECORD_RESPONSE:
+                    responses[(record["m"], record["p"])].append(
+                        ReplayResponse(record["s"], record["d"])
+                    )
+                elif record["k"] == RECORD_EVENT:
+                    events.append(record)
+        return responses, events
+
+    async def async_request(self, method, url, **kwargs):
+        """Return the next recorded response to a request."""
+        await self._async_load()
+        path = url.split("://", 1)[-1]
+        path = path[path.find("/") :]
+        responses = self._responses.get((method, path))
+        if not responses:
+            return ReplayResponse(204, "")
+        if len(responses) > 1:
+            return responses.popleft()
+        return responses[0]
+
+    async def async_replay_events(self, event_callback, event_class):
+        """Pass the recorded events on to `event_callback`."""
+        await self._async_load()
+        start = time.monotonic()
+        first = self._events[0]["t"] if self._events else 0
+        for index, record in enumerate(self._events):
+            if self.speed:
+                delay = (record["t"] - first) / self.speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif index % REPLAY_BATCH == 0:
+                await asyncio.sleep(0)
+            # events of per-appliance streams are routed by the haId of the path
+            event_id = record["i"] or record["p"].split("/")[3]
+            event_callback(event_class(record["e"], record["d"], event_id))
+            self.replayed += 1
+        self.duration = time.monotonic() - start
+        _LOGGER.info(
+            "Replayed %s events in %.2f s (%.0f events/s)",
+            self.replayed,
+            self.duration,
+            self.replayed / self.duration if self.duration else 0,
+        )
+        self.finished.set()
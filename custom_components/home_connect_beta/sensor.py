@@ -2,37 +2,85 @@
 
 from datetime import timedelta
 import logging
+import time
 
 from homeassistant.components.sensor import SensorEntity
-from homeassistant.const import CONF_ENTITIES, DEVICE_CLASS_TIMESTAMP
+from homeassistant.const import CONF_DEVICE, CONF_ENTITIES, DEVICE_CLASS_TIMESTAMP
+from homeassistant.core import callback
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_point_in_utc_time,
+)
 import homeassistant.util.dt as dt_util
 
-from .const import ATTR_VALUE, BSH_OPERATION_STATE, DOMAIN
+from .const import (
+    ATTR_VALUE,
+    BSH_OPERATION_STATE,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_MIN_DELTA,
+    CONF_MIN_INTERVAL,
+    CONF_SENSOR_THROTTLE,
+    DATA_CONFIG,
+    DEFAULT_DIAGNOSTIC_SENSORS,
+    DEFAULT_SENSOR_THROTTLE,
+    DOMAIN,
+)
 from .entity import HomeConnectEntity
 
 _LOGGER = logging.getLogger(__name__)
 
+# smaller changes of the estimated time of a timestamp sensor are not written
+TIMESTAMP_THRESHOLD = timedelta(seconds=60)
+
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the Home Connect sensor."""
 
+    throttle = {
+        **DEFAULT_SENSOR_THROTTLE,
+        **hass.data.get(DATA_CONFIG, {}).get(CONF_SENSOR_THROTTLE, {}),
+    }
+
     def get_entities():
         """Get a list of entities."""
         entities = []
         hc_api = hass.data[DOMAIN][config_entry.entry_id]
         for device_dict in hc_api.devices:
             entity_dicts = device_dict.get(CONF_ENTITIES, {}).get("sensor", [])
-            entities += [HomeConnectSensor(**d) for d in entity_dicts]
+            entities += [
+                HomeConnectSensor(**d, throttle=throttle.get(d["key"]))
+                for d in entity_dicts
+            ]
         return entities
 
-    async_add_entities(await hass.async_add_executor_job(get_entities), True)
+    async_add_entities(get_entities(), True)
+
+    if hass.data.get(DATA_CONFIG, {}).get(
+        CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS
+    ):
+        hc_api = hass.data[DOMAIN][config_entry.entry_id]
+        async_add_entities(
+            [
+                HomeConnectDiagnosticSensor(hc_api, desc)
+                for desc in HomeConnectDiagnosticSensor.SENSORS
+            ],
+            True,
+        )
 
 
 class HomeConnectSensor(HomeConnectEntity, SensorEntity):
     """Sensor class for Home Connect."""
 
-    def __init__(self, device, desc, key, unit, icon, device_class, sign=1):
-        """Initialize the entity."""
+    def __init__(
+        self, device, desc, key, unit, icon, device_class, sign=1, throttle=None
+    ):
+        """Initialize the entity.
+
+        With a `throttle` policy, changes of a numeric value are only
+        written if they differ from the last written value by at least
+        its `min_delta` and come at least its `min_interval` after the
+        last write.
+        """
         super().__init__(device, desc)
         self._state = None
         self._key = key
@@ -40,6 +88,101 @@ class HomeConnectSensor(HomeConnectEntity, SensorEntity):
         self._icon = icon
         self._device_class = device_class
         self._sign = sign
+        self._throttle = throttle
+        self._written_value = None
+        self._written = 0
+        self._cancel_trailing_update = None
+        self._time = None
+        self._cancel_expiry = None
+
+    @property
+    def status_keys(self):
+        """Return the status keys the entity state is derived from."""
+        return {self._key}
+
+    @callback
+    def _update_callback(self, keys=None, received=None):
+        """Update data unless the change of the value is throttled."""
+        if keys is not None and self._key in keys and self._async_throttled():
+            return
+        super()._update_callback(keys, received)
+
+    @callback
+    def _async_throttled(self):
+        """Return true if the new value is not to be written yet.
+
+        Values that appear, disappear or are not numeric are never
+        throttled. A change that comes too soon is written once the
+        interval has passed.
+        """
+        if self._throttle is None:
+            return False
+        value = self.device.status.get(self._key, {}).get(ATTR_VALUE)
+        try:
+            delta = abs(float(value) - float(self._written_value))
+        except (TypeError, ValueError):
+            return False
+        if delta < self._throttle.get(CONF_MIN_DELTA, 0):
+            return True
+        wait = self._throttle.get(CONF_MIN_INTERVAL, 0) - (
+            time.monotonic() - self._written
+        )
+        if wait <= 0:
+            return False
+        if self._cancel_trailing_update is None:
+            self._cancel_trailing_update = async_call_later(
+                self.hass, wait, self._async_trailing_update
+            )
+        return True
+
+    @callback
+    def _async_trailing_update(self, _now):
+        """Write a change that came too soon."""
+        self._cancel_trailing_update = None
+        self.async_entity_update()
+
+    async def async_will_remove_from_hass(self):
+        """Cancel a pending write and the expiry of the time."""
+        await super().async_will_remove_from_hass()
+        if self._cancel_trailing_update is not None:
+            self._cancel_trailing_update()
+            self._cancel_trailing_update = None
+        self._async_set_time(None)
+
+    @callback
+    def _async_set_time(self, value):
+        """Set the time of a timestamp sensor.
+
+        An estimate within TIMESTAMP_THRESHOLD of the current time is
+        ignored, so that the time does not jitter with every event. A
+        time that is supposed to be in the future expires when it is
+        reached.
+        """
+        if (
+            value is not None
+            and self._time is not None
+            and abs(value - self._time) <= TIMESTAMP_THRESHOLD
+        ):
+            return
+        if self._cancel_expiry is not None:
+            self._cancel_expiry()
+            self._cancel_expiry = None
+        if value is not None and self._sign == 1:
+            if value <= dt_util.utcnow():
+                value = None
+            else:
+                self._cancel_expiry = async_track_point_in_utc_time(
+                    self.hass, self._async_expired, value
+                )
+        self._time = value
+        self._state = value.isoformat() if value is not None else None
+
+    @callback
+    def _async_expired(self, _now):
+        """Clear a time that has been reached."""
+        self._cancel_expiry = None
+        self._async_set_time(None)
+        self.async_write_ha_state()
 
     @property
     def state(self):
@@ -49,37 +192,28 @@ class HomeConnectSensor(HomeConnectEntity, SensorEntity):
     @property
     def available(self):
         """Return true if the sensor is available."""
-        return self._state is not None
+        return super().available and self._state is not None
 
     async def async_update(self):
         """Update the sensor's status."""
-        status = self.device.appliance.status
-        if self._key not in status:
+        status = self.device.status
+        self._written_value = status.get(self._key, {}).get(ATTR_VALUE)
+        self._written = time.monotonic()
+        if self.device_class == DEVICE_CLASS_TIMESTAMP:
+            if ATTR_VALUE not in status.get(self._key, {}):
+                self._async_set_time(None)
+            else:
+                seconds = self._sign * float(status[self._key][ATTR_VALUE])
+                self._async_set_time(dt_util.utcnow() + timedelta(seconds=seconds))
+        elif self._key not in status:
             self._state = None
         else:
-            if self.device_class == DEVICE_CLASS_TIMESTAMP:
-                if ATTR_VALUE not in status[self._key]:
-                    self._state = None
-                elif (
-                    self._state is not None
-                    and self._sign == 1
-                    and dt_util.parse_datetime(self._state) < dt_util.utcnow()
-                ):
-                    # if the date is supposed to be in the future but we're
-                    # already past it, set state to None.
-                    self._state = None
-                else:
-                    seconds = self._sign * float(status[self._key][ATTR_VALUE])
-                    self._state = (
-                        dt_util.utcnow() + timedelta(seconds=seconds)
-                    ).isoformat()
-            else:
-                self._state = status[self._key].get(ATTR_VALUE)
-                if self._key == BSH_OPERATION_STATE:
-                    # Value comes back as an enum, we only really care about the
-                    # last part, so split it off
-                    # https://developer.home-connect.com/docs/status/operation_state
-                    self._state = self._state.split(".")[-1]
+            self._state = status[self._key].get(ATTR_VALUE)
+            if self._key == BSH_OPERATION_STATE:
+                # Value comes back as an enum, we only really care about the
+                # last part, so split it off
+                # https://developer.home-connect.com/docs/status/operation_state
+                self._state = self._state.split(".")[-1]
         _LOGGER.debug("Updated, new state: %s", self._state)
 
     @property
@@ -96,3 +230,107 @@ class HomeConnectSensor(HomeConnectEntity, SensorEntity):
     def device_class(self):
         """Return the device class."""
         return self._device_class
+
+
+def _milliseconds(seconds):
+    """Return a duration in seconds as rounded milliseconds."""
+    if seconds is None:
+        return None
+    return round(seconds * 1000)
+
+
+class HomeConnectDiagnosticSensor(SensorEntity):
+    """Sensor for a performance metric of a Home Connect account."""
+
+    SENSORS = {
+        "Request Latency": ("ms", "mdi:timer-outline"),
+        "Event Lag": ("ms", "mdi:timer-sand"),
+        "Confirmation Latency": ("ms", "mdi:timer-check-outline"),
+        "Events Per Minute": ("events/min", "mdi:pulse"),
+        "Remaining Requests": ("requests", "mdi:counter"),
+    }
+
+    def __init__(self, hc_api, desc):
+        """Initialize the entity."""
+        self.hc_api = hc_api
+        self.desc = desc
+        self._unit, self._icon = self.SENSORS[desc]
+        self._state = None
+        self._attributes = {}
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"Home Connect {self.desc}"
+
+    @property
+    def unique_id(self):
+        """Return the unique id based on the config entry and the sensor name."""
+        return f"{self.hc_api.config_entry.entry_id}-{self.desc}"
+
+    @property
+    def device_info(self):
+        """Return info about the account."""
+        return {
+            "identifiers": {(DOMAIN, self.hc_api.config_entry.entry_id)},
+            "name": f"Home Connect {self.hc_api.config_entry.title}",
+            "manufacturer": "BSH",
+            "model": "Home Connect API",
+        }
+
+    @property
+    def state(self):
+        """Return the value of the metric."""
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        """Return the breakdown of the metric."""
+        return self._attributes
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return self._unit
+
+    @property
+    def icon(self):
+        """Return the icon."""
+        return self._icon
+
+    async def async_update(self):
+        """Update the metric."""
+        metrics = self.hc_api.metrics
+        if self.desc == "Request Latency":
+            count = sum(h.count for h in metrics.request_latency.values())
+            total = sum(h.sum for h in metrics.request_latency.values())
+            self._state = _milliseconds(total / count) if count else None
+            self._attributes = {
+                endpoint: {
+                    "mean_ms": _milliseconds(histogram.mean),
+                    "count": histogram.count,
+                    "errors": metrics.request_errors[endpoint],
+                    "rate_limited": metrics.rate_limited[endpoint],
+                }
+                for endpoint, histogram in metrics.request_latency.items()
+            }
+        elif self.desc == "Event Lag":
+            self._state = _milliseconds(metrics.event_lag.mean)
+            self._attributes = metrics.event_lag.as_dict()
+        elif self.desc == "Confirmation Latency":
+            self._state = _milliseconds(metrics.confirmation_latency.mean)
+            self._attributes = metrics.confirmation_latency.as_dict()
+        elif self.desc == "Events Per Minute":
+            self._attributes = {
+                device_dict[CONF_DEVICE].appliance.name: metrics.events_per_minute(
+                    device_dict[CONF_DEVICE].appliance.haId
+                )
+                for device_dict in self.hc_api.devices
+            }
+            self._state = sum(self._attributes.values())
+        elif self.desc == "Remaining Requests":
+            self._state = self.hc_api.rate_limiter.remaining_day
+            self._attributes = {
+                "remaining_minute": self.hc_api.rate_limiter.remaining_minute,
+                "rate_limited": self.hc_api.rate_limiter.rate_limited,
+            }
@@ -1,11 +1,13 @@
 """Provides a switch for Home Connect."""
 import logging
 
-from homeconnect.api import HomeConnectError
-
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.const import CONF_DEVICE, CONF_ENTITIES
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
+from .api import HomeConnectError
 from .const import (
     ATTR_VALUE,
     BSH_ACTIVE_PROGRAM,
@@ -13,6 +15,7 @@ from .const import (
     BSH_POWER_ON,
     BSH_POWER_STATE,
     DOMAIN,
+    SIGNAL_PROGRAMS_CHANGED,
 )
 from .entity import HomeConnectEntity
 
@@ -33,7 +36,42 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
             entities += entity_list
         return entities
 
-    async_add_entities(await hass.async_add_executor_job(get_entities), True)
+    @callback
+    def async_programs_changed(device):
+        """Add and remove program switches to match the programs of a device."""
+        switches = {
+            entity.program_name: entity
+            for entity in device.entities
+            if isinstance(entity, HomeConnectProgramSwitch)
+        }
+        entity_dicts = device.get_program_switches()
+        programs = {d["program_name"] for d in entity_dicts}
+        registry = entity_registry.async_get(hass)
+        for program_name, entity in switches.items():
+            if program_name in programs:
+                continue
+            if entity.registry_entry is not None:
+                # removing the registry entry also removes the entity
+                registry.async_remove(entity.entity_id)
+            else:
+                hass.async_create_task(entity.async_remove())
+        async_add_entities(
+            [
+                HomeConnectProgramSwitch(**d)
+                for d in entity_dicts
+                if d["program_name"] not in switches
+            ],
+            True,
+        )
+
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_PROGRAMS_CHANGED.format(config_entry.entry_id),
+            async_programs_changed,
+        )
+    )
+    async_add_entities(get_entities(), True)
 
 
 class HomeConnectProgramSwitch(HomeConnectEntity, SwitchEntity):
@@ -47,39 +85,39 @@ class HomeConnectProgramSwitch(HomeConnectEntity, SwitchEntity):
         self._state = None
         self._remote_allowed = None
 
+    @property
+    def status_keys(self):
+        """Return the status keys the entity state is derived from."""
+        return {BSH_ACTIVE_PROGRAM}
+
     @property
     def is_on(self):
         """Return true if the switch is on."""
         return bool(self._state)
 
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        return True
-
     async def async_turn_on(self, **kwargs):
         """Start the program."""
         _LOGGER.debug("Tried to turn on program %s", self.program_name)
+        self.device.async_set_optimistic(BSH_ACTIVE_PROGRAM, self.program_name)
         try:
-            await self.hass.async_add_executor_job(
-                self.device.appliance.start_program, self.program_name
-            )
+            await self.device.appliance.async_start_program(self.program_name)
         except HomeConnectError as err:
             _LOGGER.error("Error while trying to start program: %s", err)
-        self.async_entity_update()
+            self.device.async_rollback(BSH_ACTIVE_PROGRAM)
 
     async def async_turn_off(self, **kwargs):
         """Stop the program."""
         _LOGGER.debug("Tried to stop program %s", self.program_name)
+        self.device.async_set_optimistic(BSH_ACTIVE_PROGRAM, None)
         try:
-            await self.hass.async_add_executor_job(self.device.appliance.stop_program)
+            await self.device.appliance.async_stop_program()
         except HomeConnectError as err:
             _LOGGER.error("Error while trying to stop program: %s", err)
-        self.async_entity_update()
+            self.device.async_rollback(BSH_ACTIVE_PROGRAM)
 
     async def async_update(self):
         """Update the switch's status."""
-        state = self.device.appliance.status.get(BSH_ACTIVE_PROGRAM, {})
+        state = self.device.status.get(BSH_ACTIVE_PROGRAM, {})
         if state.get(ATTR_VALUE) == self.program_name:
             self._state = True
         else:
@@ -95,6 +133,11 @@ class HomeConnectPowerSwitch(HomeConnectEntity, SwitchEntity):
         super().__init__(device, "Power")
         self._state = None
 
+    @property
+    def status_keys(self):
+        """Return the status keys the entity state is derived from."""
+        return {BSH_POWER_STATE, BSH_OPERATION_STATE}
+
     @property
     def is_on(self):
         """Return true if the switch is on."""
@@ -104,43 +147,28 @@ class HomeConnectPowerSwitch(HomeConnectEntity, SwitchEntity):
         """Switch the device on."""
         _LOGGER.debug("Tried to switch on %s", self.name)
         try:
-            await self.hass.async_add_executor_job(
-                self.device.appliance.set_setting, BSH_POWER_STATE, BSH_POWER_ON
-            )
+            await self.async_set_setting(BSH_POWER_STATE, BSH_POWER_ON)
         except HomeConnectError as err:
             _LOGGER.error("Error while trying to turn on device: %s", err)
-            self._state = False
-        self.async_entity_update()
 
     async def async_turn_off(self, **kwargs):
         """Switch the device off."""
         _LOGGER.debug("tried to switch off %s", self.name)
         try:
-            await self.hass.async_add_executor_job(
-                self.device.appliance.set_setting,
-                BSH_POWER_STATE,
-                self.device.power_off_state,
-            )
+            await self.async_set_setting(BSH_POWER_STATE, self.device.power_off_state)
         except HomeConnectError as err:
             _LOGGER.error("Error while trying to turn off device: %s", err)
-            self._state = True
-        self.async_entity_update()
 
     async def async_update(self):
         """Update the switch's status."""
-        if (
-            self.device.appliance.status.get(BSH_POWER_STATE, {}).get(ATTR_VALUE)
-            == BSH_POWER_ON
-        ):
+        if self.device.status.get(BSH_POWER_STATE, {}).get(ATTR_VALUE) == BSH_POWER_ON:
             self._state = True
         elif (
-            self.device.appliance.status.get(BSH_POWER_STATE, {}).get(ATTR_VALUE)
+            self.device.status.get(BSH_POWER_STATE, {}).get(ATTR_VALUE)
             == self.device.power_off_state
         ):
             self._state = False
-        elif self.device.appliance.status.get(BSH_OPERATION_STATE, {}).get(
-            ATTR_VALUE, None
-        ) in [
+        elif self.device.status.get(BSH_OPERATION_STATE, {}).get(ATTR_VALUE, None) in [
             "BSH.Common.EnumType.OperationState.Ready",
             "BSH.Common.EnumType.OperationState.DelayedStart",
             "BSH.Common.EnumType.OperationState.Run",
@@ -151,7 +179,7 @@ class HomeConnectPowerSwitch(HomeConnectEntity, SwitchEntity):
         ]:
             self._state = True
         elif (
-            self.device.appliance.status.get(BSH_OPERATION_STATE, {}).get(ATTR_VALUE)
+            self.device.status.get(BSH_OPERATION_STATE, {}).get(ATTR_VALUE)
             == "BSH.Common.EnumType.OperationState.Inactive"
         ):
             self._state = False
@@ -0,0 +1,13 @@
+"""Fixtures for the Home Connect Beta tests."""
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+
+@pytest.fixture
+def hc(hass):
+    """Return a mocked Home Connect account."""
+    hc_api = MagicMock()
+    hc_api.hass = hass
+    hc_api.async_put = AsyncMock(return_value={})
+    return hc_api
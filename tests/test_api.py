@@ -0,0 +1,51 @@
+"""Tests for the Home Connect API."""
+import asyncio
+
+import pytest
+
+from custom_components.home_connect_beta.api import HomeConnectAppliance, RateLimiter
+from custom_components.home_connect_beta.const import COOKING_LIGHTING_BRIGHTNESS
+
+
+async def test_setting_writes_are_coalesced(hc):
+    """Test that a burst of writes to one setting sends its last value only."""
+    appliance = HomeConnectAppliance(hc, "appliance")
+
+    await asyncio.gather(
+        *(
+            appliance.async_set_setting(COOKING_LIGHTING_BRIGHTNESS, brightness)
+            for brightness in range(100)
+        )
+    )
+
+    assert hc.async_put.call_count <= 2
+    path, data = hc.async_put.call_args.args
+    assert path.endswith(f"/settings/{COOKING_LIGHTING_BRIGHTNESS}")
+    assert data["data"]["value"] == 99
+
+
+async def test_unexpected_error_fails_pending_writes(hc):
+    """Test that an unexpected error is raised to the waiting writes."""
+    hc.async_put.side_effect = RuntimeError("unexpected")
+    appliance = HomeConnectAppliance(hc, "appliance")
+
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(
+            appliance.async_set_setting(COOKING_LIGHTING_BRIGHTNESS, 50), 1
+        )
+
+    hc.async_put.side_effect = None
+    await asyncio.wait_for(
+        appliance.async_set_setting(COOKING_LIGHTING_BRIGHTNESS, 60), 1
+    )
+    assert hc.async_put.call_count == 2
+
+
+async def test_small_request_budget_keeps_room_for_background_requests():
+    """Test that a budget below the default reserve still allows requests."""
+    limiter = RateLimiter(per_minute=10, per_day=100)
+
+    for _ in range(8):
+        await asyncio.wait_for(limiter.async_acquire(), 1)
+
+    assert limiter.remaining_minute == 2
@@ -0,0 +1,93 @@
+"""Tests for the Home Connect entity base class."""
+import json
+
+from homeassistant.core import callback
+
+from custom_components.home_connect_beta.api import (
+    Event,
+    HomeConnectAppliance,
+    HomeConnectDevice,
+)
+from custom_components.home_connect_beta.const import (
+    BSH_DOOR_STATE,
+    BSH_OPERATION_STATE,
+    DATA_ENTITIES,
+    EVENT_TYPE_STATUS,
+)
+from custom_components.home_connect_beta.entity import HomeConnectEntity
+
+
+class CountingEntity(HomeConnectEntity):
+    """Entity counting its update callbacks and updates."""
+
+    def __init__(self, device, desc, key):
+        """Initialize the entity."""
+        super().__init__(device, desc)
+        self.key = key
+        self.callbacks = 0
+        self.updates = 0
+
+    @property
+    def status_keys(self):
+        """Return the status keys the entity state is derived from."""
+        return {self.key}
+
+    @callback
+    def _update_callback(self, keys=None, received=None):
+        """Count the callback."""
+        self.callbacks += 1
+        super()._update_callback(keys, received)
+
+    @callback
+    def async_entity_update(self):
+        """Count the update."""
+        self.updates += 1
+
+
+async def _async_add_entities(hass, device):
+    """Add a door and an operation state entity of a device."""
+    entities = []
+    for desc, key in (("Door", BSH_DOOR_STATE), ("State", BSH_OPERATION_STATE)):
+        entity = CountingEntity(device, desc, key)
+        entity.hass = hass
+        entity.entity_id = f"sensor.{device.appliance.haId}_{desc}".lower()
+        await entity.async_added_to_hass()
+        entities.append(entity)
+    return entities
+
+
+async def test_event_only_reaches_entities_of_its_appliance(hass, hc):
+    """Test that an event runs the callbacks of one appliance only."""
+    hass.data[DATA_ENTITIES] = {}
+    devices = [
+        HomeConnectDevice(hass, HomeConnectAppliance(hc, f"appliance{number}"))
+        for number in range(10)
+    ]
+    entities = {
+        device.appliance.haId: await _async_add_entities(hass, device)
+        for device in devices
+    }
+
+    devices[0].event_callback(
+        Event(
+            EVENT_TYPE_STATUS,
+            json.dumps({"items": [{"key": BSH_DOOR_STATE, "value": "Open"}]}),
+            "appliance0",
+        )
+    )
+    await hass.async_block_till_done()
+
+    door, state = entities["appliance0"]
+    assert door.callbacks == 1
+    assert door.updates == 1
+    assert state.callbacks == 1
+    assert state.updates == 0
+    assert (
+        sum(
+            entity.callbacks
+            for ha_id, device_entities in entities.items()
+            if ha_id != "appliance0"
+            for entity in device_entities
+        )
+        == 0
+    )